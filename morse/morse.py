@@ -5,11 +5,13 @@ Program to read morse sounds from the internal microphone and print
 the English characters.  The program attempts to read dynamic parameters
 from the default JSON file ({progname}.json).
 
-Usage:  {progname}.py [-f <params_file>] [-h] [-n]
+Usage:  {progname}.py [-f <params_file>] [-h] [-n] [-t <trace_file>]
 
 where -f <params_file> means read params from the given file
       -h               means print this help and stop
       -n               means don't read any params JSON file
+      -t <trace_file>  means write a binary token trace to the given file
+                       at the end (see ../morse_trainer/token_trace.py)
 """
 
 
@@ -18,8 +20,14 @@ import_errors = False
 import sys
 import json
 import getopt
+import os.path
 import logger
 
+# the morse code table and token trace are shared with ../morse_trainer
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'morse_trainer'))
+import morse_code
+
 try:
     import pyaudio
 except ImportError:
@@ -35,6 +43,8 @@ except ImportError:
 if import_errors:
     sys.exit(10)
 
+import token_trace
+
 
 # get program name from sys.argv
 ProgName = sys.argv[0]
@@ -66,62 +76,17 @@ SignalThreshold = 10000
 CharSpace = 3      # number of silences indicates a space
 WordSpace = 9      # number of silences to end word
 
-# dict to translate morse code to English chars
-Morse = {
-         '.-':      'A',
-         '-...':    'B',
-         '-.-.':    'C',
-         '-..':     'D',
-         '.':       'E',
-         '..-.':    'F',
-         '--.':     'G',
-         '....':    'H',
-         '..':      'I',
-         '.---':    'J',
-         '-.-':     'K',
-         '.-..':    'L',
-         '--':      'M',
-         '-.':      'N',
-         '---':     'O',
-         '.--.':    'P',
-         '--.-':    'Q',
-         '.-.':     'R',
-         '...':     'S',
-         '-':       'T',
-         '..-':     'U',
-         '...-':    'V',
-         '.--':     'W',
-         '-..-':    'X',
-         '-.--':    'Y',
-         '--..':    'Z',
-         '.----':   '1',
-         '..---':   '2',
-         '...--':   '3',
-         '....-':   '4',
-         '.....':   '5',
-         '-....':   '6',
-         '--...':   '7',
-         '---..':   '8',
-         '----.':   '9',
-         '-----':   '0',
-         '.-.-.-':  '.',
-         '--..--':  ',',
-         '..--..':  '?',
-         '.----.':  '\'',
-         '-.-.--':  '!',
-         '-..-.':   '/',
-         '-.--.':   '(',
-         '-.--.-':  ')',
-         '.-...':   '&',
-         '---...':  ':',
-         '-.-.-.':  ';',
-         '-...-':   '=',
-         '-....-':  '-',
-         '..--.-':  '_',
-         '.-..-.':  '"',
-         '...-..-': '$',
-         '.--.-.':  '@',
-        }
+# dict to translate morse code to English chars, and the integer-coded
+# table for decoding one element at a time
+Morse = morse_code.Chars
+Tree = morse_code.Tree
+
+# the token_trace.TokenTrace recording every token, if tracing
+Trace = None
+
+# number of averaged values (CHUNK samples each) read from the stream,
+# the trace times are the stream position, like ReadMorse
+Values = 0
 
 
 def save_params(path):
@@ -177,15 +142,12 @@ def emit_char(char):
     sys.stdout.flush()
 
 def decode_morse(morse):
-    """Decode morse code and send character to output.
+    """Decode morse code node number and send character to output.
 
     Also return the decode character.
     """
 
-    try:
-        char = Morse[morse]
-    except KeyError:
-        char = u'\u00bf' + '<%s>' % morse
+    char = Tree.decode(morse)
     print(char, end='')
     sys.stdout.flush()
     return char
@@ -214,6 +176,8 @@ def get_sample(stream):
     state = S_SILENCE
     hold = HOLD
 
+    global Values
+
     values = []
 
     while True:
@@ -222,7 +186,8 @@ def get_sample(stream):
         data = np.fromstring(data, 'int16')
         data = [abs(x) for x in data]
         value = int(sum(data) // len(data))      # average value
-        log('AVG value=%d' % value)
+        Values += 1
+        log.debug('AVG value=%d', value)
         values.append(value)
 
         if state == S_SILENCE:
@@ -254,12 +219,12 @@ def read_morse(stream):
     global LenDot, LenDash, DotDashThreshold, CharSpace, WordSpace
     global MaxSignal, MinSignal, SignalThreshold
 
-    log('read_morse: LenDot=%d, LenDash=%d, DotDashThreshold=%d, CharSpace=%d, WordSpace=%d'
-        % (LenDot, LenDash, DotDashThreshold, CharSpace, WordSpace))
+    log.debug('read_morse: LenDot=%d, LenDash=%d, DotDashThreshold=%d, CharSpace=%d, WordSpace=%d',
+              LenDot, LenDash, DotDashThreshold, CharSpace, WordSpace)
 
     space_count = 0
     word_count = 0
-    morse = ''
+    morse = morse_code.CodeTree.Root
     sent_space = True
     sent_word_space = True
 
@@ -267,25 +232,36 @@ def read_morse(stream):
 
     while True:
         (count, level) = get_sample(stream)
-        log('count=%d, level=%d, space_count=%d, word_count=%d'
-            % (count, level, space_count, word_count))
+        if Trace is not None:
+            Trace.record(Values * CHUNK / RATE, count, level, SignalThreshold,
+                         LenDot, LenDash)
+        log.debug('count=%d, level=%d, space_count=%d, word_count=%d',
+                  count, level, space_count, word_count)
 
         if count > 0:
             MaxSignal = level
             if count < 3:
-                log('got short sound, count=%d' % count)
+                log.debug('got short sound, count=%d', count)
                 continue
             sent_word_space = False
             # got a sound, dot or dash?
-            if count > DotDashThreshold:
-                morse += '-'
+            dash = count > DotDashThreshold
+            if dash:
                 LenDash = (LenDash*2 + count) // 3
-                log('got -')
+                log.debug('got -')
             else:
-                morse += '.'
                 LenDot = (LenDot*2 + count) // 3
-                log('got .')
+                log.debug('got .')
             DotDashThreshold = (LenDot + LenDash) // 2
+            if morse is not None:
+                morse = Tree.step(morse, dash)
+                if not Tree.possible(morse):
+                    # no code starts like this, cut the character off now
+                    # and ignore the rest of it (morse is None)
+                    decode = decode_morse(morse)
+                    log.error('Morse: %s (%s) is not a known code, character cut off',
+                              Tree.code(morse), decode)
+                    morse = None
 #            CharSpace = 2
 #            WordSpace = 6
             sent_space = False
@@ -300,12 +276,15 @@ def read_morse(stream):
             # if silence long enough, emit a space
             if space_count >= CharSpace:
                 space_count = 0
-                if morse:
+                if morse is None:
+                    # end of a character that was cut off
+                    morse = morse_code.CodeTree.Root
+                if morse != morse_code.CodeTree.Root:
                     decode = decode_morse(morse)
-                    log('Morse: %s (%s)' % (morse, decode))
-                    morse = ''
-                    log('modified: LenDot=%d, LenDash=%d, DotDashThreshold=%d, CharSpace=%d, WordSpace=%d'
-                        % (LenDot, LenDash, DotDashThreshold, CharSpace, WordSpace))
+                    log.debug('Morse: %s (%s)', Tree.code(morse), decode)
+                    morse = morse_code.CodeTree.Root
+                    log.debug('modified: LenDot=%d, LenDash=%d, DotDashThreshold=%d, CharSpace=%d, WordSpace=%d',
+                              LenDot, LenDash, DotDashThreshold, CharSpace, WordSpace)
                     word_count = 0
                 elif not sent_space:
                     emit_char(' ')
@@ -320,8 +299,8 @@ def read_morse(stream):
         # set new signal threshold
         SignalThreshold = (MinSignal + 2*MaxSignal)//3
 
-        log('SignalThreshold=%d, LenDot=%d, LenDash=%d, DotDashThreshold=%d, CharSpace=%d, WordSpace=%d'
-            % (SignalThreshold, LenDot, LenDash, DotDashThreshold, CharSpace, WordSpace))
+        log.debug('SignalThreshold=%d, LenDot=%d, LenDash=%d, DotDashThreshold=%d, CharSpace=%d, WordSpace=%d',
+                  SignalThreshold, LenDot, LenDash, DotDashThreshold, CharSpace, WordSpace)
 
 def usage(msg=None):
     if msg:
@@ -336,12 +315,14 @@ log = logger.Log(LogFile, logger.Log.DEBUG)
 argv = sys.argv[1:]
 
 try:
-    (opts, args) = getopt.getopt(argv, 'f:hn', ['file=', 'help', 'noparams'])
+    (opts, args) = getopt.getopt(argv, 'f:hnt:', ['file=', 'help', 'noparams',
+                                                  'trace='])
 except getopt.GetoptError as err:
     usage(err)
     sys.exit(1)
 
 params_file = ParamsFile
+trace_file = None
 for (opt, param) in opts:
     if opt in ['-f', '--file']:
         params_file = param
@@ -350,6 +331,9 @@ for (opt, param) in opts:
         sys.exit(0)
     elif opt in ['-n', '--noparams']:
         params_file = None
+    elif opt in ['-t', '--trace']:
+        trace_file = param
+        Trace = token_trace.TokenTrace()
 
 if params_file:
     load_params(params_file)
@@ -367,6 +351,8 @@ except KeyboardInterrupt:
     pass
 
 save_params(ParamsFile)
+if trace_file:
+    Trace.dump(trace_file)
 
 morse.stop_stream()
 morse.close()
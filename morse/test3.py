@@ -2,7 +2,13 @@
 
 from __future__ import print_function
 import sys
+import os.path
 import logger
+
+# the morse code table is shared with ../morse_trainer
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'morse_trainer'))
+import morse_code
 try:
     import pyaudio
 except ImportError:
@@ -29,61 +35,7 @@ MaxBucket = 32
 
 SILENCE = 200
 
-Morse = {
-         '.-': 'A',
-         '-...': 'B',
-         '-.-.': 'C',
-         '-..': 'D',
-         '.': 'E',
-         '..-.': 'F',
-         '--.': 'G',
-         '....': 'H',
-         '..': 'I',
-         '.---': 'J',
-         '-.-': 'K',
-         '.-..': 'L',
-         '--': 'M',
-         '-.': 'N',
-         '---': 'O',
-         '.--.': 'P',
-         '--.-': 'Q',
-         '.-.': 'R',
-         '...': 'S',
-         '-': 'T',
-         '..-': 'U',
-         '...-': 'V',
-         '.--': 'W',
-         '-..-': 'X',
-         '-.--': 'Y',
-         '--..': 'Z',
-         '.----': '1',
-         '..---': '2',
-         '...--': '3',
-         '....-': '4',
-         '.....': '5',
-         '-....': '6',
-         '--...': '7',
-         '---..': '8',
-         '----.': '9',
-         '-----': '0',
-         '.-.-.-': '.',
-         '--..--': ',',
-         '..--..': '?',
-         '.----.': '\'',
-         '-.-.--': '!',
-         '-..-.': '/',
-         '-.--.': '(',
-         '-.--.-': ')',
-         '.-...': '&',
-         '---...': ':',
-         '-.-.-.': ';',
-         '-...-': '=',
-         '-....-': '-',
-         '..--.-': '_',
-         '.-..-.': '"',
-         '...-..-': '$',
-         '.--.-.': '@',
-        }
+Morse = morse_code.Chars
 
 
 def decodeMorse(morse):
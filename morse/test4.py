@@ -1,7 +1,13 @@
 #!/bin/env python3
 
 import sys
+import os.path
 import logger
+
+# the morse code table is shared with ../morse_trainer
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'morse_trainer'))
+import morse_code
 try:
     import pyaudio
 except ImportError:
@@ -33,61 +39,7 @@ CHAR_SPACE = 3      # number of silences indicates a space
 WORD_SPACE = 9      # number of silences to end word
 
 # dict to translate morse code to English chars
-Morse = {
-         '.-':      'A',
-         '-...':    'B',
-         '-.-.':    'C',
-         '-..':     'D',
-         '.':       'E',
-         '..-.':    'F',
-         '--.':     'G',
-         '....':    'H',
-         '..':      'I',
-         '.---':    'J',
-         '-.-':     'K',
-         '.-..':    'L',
-         '--':      'M',
-         '-.':      'N',
-         '---':     'O',
-         '.--.':    'P',
-         '--.-':    'Q',
-         '.-.':     'R',
-         '...':     'S',
-         '-':       'T',
-         '..-':     'U',
-         '...-':    'V',
-         '.--':     'W',
-         '-..-':    'X',
-         '-.--':    'Y',
-         '--..':    'Z',
-         '.----':   '1',
-         '..---':   '2',
-         '...--':   '3',
-         '....-':   '4',
-         '.....':   '5',
-         '-....':   '6',
-         '--...':   '7',
-         '---..':   '8',
-         '----.':   '9',
-         '-----':   '0',
-         '.-.-.-':  '.',
-         '--..--':  ',',
-         '..--..':  '?',
-         '.----.':  '\'',
-         '-.-.--':  '!',
-         '-..-.':   '/',
-         '-.--.':   '(',
-         '-.--.-':  ')',
-         '.-...':   '&',
-         '---...':  ':',
-         '-.-.-.':  ';',
-         '-...-':   '=',
-         '-....-':  '-',
-         '..--.-':  '_',
-         '.-..-.':  '"',
-         '...-..-': '$',
-         '.--.-.':  '@',
-        }
+Morse = morse_code.Chars
 
 
 def save_params(path):
@@ -0,0 +1,111 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+asyncio wrappers for SendMorse and ReadMorse.
+
+The blocking work runs in an executor so the event loop is never
+stalled.  Many wrappers may share one executor, so many sessions don't
+need a thread each.
+
+sender = AsyncSendMorse(SendMorse(...), executor=None)
+------------------------------------------------------
+
+await sender.send(text)
+-----------------------
+Send 'text', returning when it has been written to the sink.
+
+samples = await sender.render(text)
+-----------------------------------
+
+reader = AsyncReadMorse(ReadMorse(...), executor=None)
+------------------------------------------------------
+
+char = await reader.read_morse()
+--------------------------------
+Return one character, raises EOFError at the end of a file source.
+
+async for char in reader.chars():
+---------------------------------
+Yield received characters until the source ends.
+"""
+
+import asyncio
+
+
+class AsyncSendMorse:
+    """An asyncio interface to a SendMorse object."""
+
+    def __init__(self, sender, executor=None):
+        """Wrap a SendMorse object.
+
+        sender    the SendMorse object
+        executor  a concurrent.futures executor, None means the default
+        """
+
+        self.sender = sender
+        self.executor = executor
+
+    async def send(self, text):
+        """Send 'text' without blocking the event loop."""
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.sender.send, text)
+
+    async def render(self, text):
+        """Return the sound of 'text' without blocking the event loop."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.sender.render,
+                                          text)
+
+
+class AsyncReadMorse:
+    """An asyncio interface to a ReadMorse object."""
+
+    # most characters decoded in one executor call from a file source
+    Batch = 64
+
+    def __init__(self, reader, executor=None):
+        """Wrap a ReadMorse object.
+
+        reader    the ReadMorse object
+        executor  a concurrent.futures executor, None means the default
+        """
+
+        self.reader = reader
+        self.executor = executor
+
+        # a live source must hand over each character as it arrives,
+        # other sources are decoded a batch at a time to save overhead
+        self.batch = 1 if reader.stream.live else AsyncReadMorse.Batch
+
+    async def read_morse(self):
+        """Return one character without blocking the event loop."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          self.reader.read_morse)
+
+    def _read_batch(self):
+        """Return (chars, at_end), up to 'batch' characters."""
+
+        chars = []
+        try:
+            while len(chars) < self.batch:
+                chars.append(self.reader.read_morse())
+        except EOFError:
+            return (chars, True)
+        return (chars, False)
+
+    async def chars(self):
+        """Generate received characters until the source ends."""
+
+        loop = asyncio.get_running_loop()
+        while True:
+            (chars, at_end) = await loop.run_in_executor(self.executor,
+                                                         self._read_batch)
+            for char in chars:
+                yield char
+            if at_end:
+                return
@@ -0,0 +1,346 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Audio sources and sinks for the morse reader and sender.
+
+ReadMorse reads from a 'source' and SendMorse writes to a 'sink', so
+neither needs a sound card.  A source has a .rate attribute, a .live
+attribute (True if reads block in real time) and the methods:
+
+    data = source.read(num_samples)     # int16 samples, empty at the end
+    source.close()
+
+A sink has a .rate attribute and the methods:
+
+    sink.write(data)    # float32 samples (numpy array or bytes)
+    sink.close()
+
+The backends are:
+
+PyAudioInput(rate, chunk)       the microphone, blocking reads
+CallbackInput(rate, chunk, size)
+                                the microphone, captured by the PortAudio
+                                callback into a RingBuffer
+PyAudioOutput(rate)             the speakers
+pcm_file.PCMFile(filename)      a .WAV or raw PCM file source
+WavOutput(filename, rate)       a .WAV file sink
+Loopback(rate)                  an in-memory sink and source, everything
+                                written can be read back immediately
+
+ring_write(ring, position, values) copies values into a numpy ring
+buffer, wrapping at the end, for RingBuffer and the level estimators.
+"""
+
+import wave
+import threading
+import collections
+
+import numpy as np
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+
+# scale float32 samples in [-1.0, 1.0] to int16
+Int16Scale = 32767
+
+
+def float_samples(data):
+    """Return float32 sink data (numpy array or bytes) as a numpy array."""
+
+    if isinstance(data, (bytes, bytearray)):
+        return np.frombuffer(data, dtype=np.float32)
+    return np.asarray(data, dtype=np.float32)
+
+def to_int16(data):
+    """Convert float32 sink data to int16 samples."""
+
+    samples = np.clip(float_samples(data), -1.0, 1.0)
+    return (samples * Int16Scale).astype(np.int16)
+
+def _pyaudio():
+    """Return a PyAudio object, or raise if PyAudio isn't installed."""
+
+    if pyaudio is None:
+        raise Exception("Can't import 'pyaudio', no sound card I/O possible")
+    return pyaudio.PyAudio()
+
+
+class PyAudioInput:
+    """A microphone source."""
+
+    live = True
+
+    def __init__(self, rate=8000, chunk=16):
+        """Open the microphone.
+
+        rate   sample rate (samples/second)
+        chunk  frames per PortAudio buffer
+        """
+
+        self.rate = rate
+        self.pyaudio = _pyaudio()
+        self.stream = self.pyaudio.open(format=pyaudio.paInt16,
+                                        channels=1,
+                                        rate=rate,
+                                        input=True,
+                                        frames_per_buffer=chunk)
+
+    def read(self, num_samples, exception_on_overflow=False):
+        """Return 'num_samples' int16 samples as bytes."""
+
+        return self.stream.read(num_samples,
+                                exception_on_overflow=exception_on_overflow)
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+        self.pyaudio.terminate()
+
+
+def ring_write(ring, position, values):
+    """Copy 'values' into 'ring' from 'position', wrapping at the end.
+
+    ring      a numpy array, written along its first axis
+    position  running total of values written, taken modulo the ring size
+    values    no more values than the ring holds
+    """
+
+    size = len(ring)
+    start = position % size
+    first = min(len(values), size - start)
+    ring[start:start+first] = values[:first]
+    ring[:len(values)-first] = values[first:]
+
+
+class RingBuffer:
+    """A preallocated ring buffer of samples.
+
+    Safe with one writer thread and one reader thread without a lock: the
+    writer only changes .head and the reader only changes .tail, and both
+    are running totals so neither side can misread the other.  Samples
+    that don't fit are dropped and counted in .dropped.
+    """
+
+    def __init__(self, size, dtype=np.int16):
+        """Prepare the buffer.
+
+        size   number of samples the buffer holds
+        dtype  numpy type of the samples
+        """
+
+        self.size = size
+        self.data = np.zeros(size, dtype=dtype)
+        self.head = 0           # total samples ever written
+        self.tail = 0           # total samples ever read
+        self.dropped = 0        # total samples dropped, buffer was full
+
+    def __len__(self):
+        """Return the number of samples waiting to be read."""
+
+        return self.head - self.tail
+
+    def write(self, samples):
+        """Copy samples in, return the number written."""
+
+        space = self.size - (self.head - self.tail)
+        num = min(len(samples), space)
+        self.dropped += len(samples) - num
+
+        ring_write(self.data, self.head, samples[:num])
+
+        self.head += num
+        return num
+
+    def read(self, num_samples):
+        """Return a copy of up to 'num_samples' samples."""
+
+        num = min(num_samples, self.head - self.tail)
+
+        start = self.tail % self.size
+        first = min(num, self.size - start)
+        result = np.concatenate((self.data[start:start+first],
+                                 self.data[:num-first]))
+
+        self.tail += num
+        return result
+
+
+class CallbackInput:
+    """A microphone source captured by the PortAudio callback.
+
+    The callback only copies each buffer into a RingBuffer, so capture
+    keeps up even when the thread calling .read() is busy.  .overflows
+    counts samples dropped because the ring was full and .overruns counts
+    PortAudio input overflow reports.
+    """
+
+    live = True
+
+    # PortAudio callback status flag for lost input
+    InputOverflow = 2
+
+    def __init__(self, rate=8000, chunk=256, size=65536):
+        """Open the microphone and start capturing.
+
+        rate   sample rate (samples/second)
+        chunk  frames per PortAudio callback
+        size   samples held in the ring buffer
+        """
+
+        self.rate = rate
+        self.ring = RingBuffer(size)
+        self.overruns = 0               # PortAudio overflow reports
+        self.ready = threading.Event()
+        self.wanted = 0
+        self.closed = False
+
+        self.pyaudio = _pyaudio()
+        self.stream = self.pyaudio.open(format=pyaudio.paInt16,
+                                        channels=1,
+                                        rate=rate,
+                                        input=True,
+                                        frames_per_buffer=chunk,
+                                        stream_callback=self._callback)
+
+    @property
+    def overflows(self):
+        """Samples dropped because the ring buffer was full."""
+
+        return self.ring.dropped
+
+    def _callback(self, data, frame_count, time_info, status):
+        """Called by PortAudio in its own thread with new samples."""
+
+        if status & CallbackInput.InputOverflow:
+            self.overruns += 1
+        self.ring.write(np.frombuffer(data, dtype=np.int16))
+        if len(self.ring) >= self.wanted:
+            self.ready.set()
+        return (None, pyaudio.paContinue)
+
+    def read(self, num_samples, exception_on_overflow=False):
+        """Return 'num_samples' int16 samples, waiting until available.
+
+        Returns what is buffered if the source is closed while waiting.
+        """
+
+        self.wanted = num_samples
+        while len(self.ring) < num_samples and not self.closed:
+            self.ready.wait(0.1)
+            self.ready.clear()
+        return self.ring.read(num_samples)
+
+    def close(self):
+        self.closed = True
+        self.stream.stop_stream()
+        self.stream.close()
+        self.pyaudio.terminate()
+
+
+class PyAudioOutput:
+    """A speaker sink."""
+
+    def __init__(self, rate=44000):
+        """Open the speakers.
+
+        rate  sample rate (samples/second)
+        """
+
+        self.rate = rate
+        self.pyaudio = _pyaudio()
+        self.stream = self.pyaudio.open(format=pyaudio.paFloat32,
+                                        channels=1,
+                                        rate=rate,
+                                        output=True)
+
+    def write(self, data):
+        """Play float32 samples, blocking until they are buffered."""
+
+        if not isinstance(data, (bytes, bytearray)):
+            data = float_samples(data).tobytes()
+        self.stream.write(data)
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+        self.pyaudio.terminate()
+
+
+class WavOutput:
+    """A sink that writes 16 bit mono .WAV files."""
+
+    def __init__(self, filename, rate=44000):
+        """Create the file.
+
+        filename  path to the .WAV file
+        rate      sample rate (samples/second)
+        """
+
+        self.rate = rate
+        self.wav = wave.open(filename, 'wb')
+        self.wav.setnchannels(1)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(rate)
+
+    def write(self, data):
+        self.wav.writeframes(to_int16(data).tobytes())
+
+    def close(self):
+        self.wav.close()
+
+
+class Loopback:
+    """An in-memory sink connected to a source.
+
+    Samples written are queued and read back as int16 with no delay, so
+    SendMorse can drive ReadMorse faster than real time.
+    """
+
+    live = False
+
+    def __init__(self, rate=44000):
+        """Prepare the loopback.
+
+        rate  sample rate (samples/second) of both ends
+        """
+
+        self.rate = rate
+        self.queue = collections.deque()
+        self.queued = 0
+
+    def __len__(self):
+        """Return the number of samples waiting to be read."""
+
+        return self.queued
+
+    def write(self, data):
+        samples = to_int16(data)
+        if len(samples):
+            self.queue.append(samples)
+            self.queued += len(samples)
+
+    def read(self, num_samples, exception_on_overflow=False):
+        """Return up to 'num_samples' int16 samples, empty if none queued."""
+
+        blocks = []
+        wanted = num_samples
+        while wanted and self.queue:
+            block = self.queue.popleft()
+            if len(block) > wanted:
+                self.queue.appendleft(block[wanted:])
+                block = block[:wanted]
+            blocks.append(block)
+            wanted -= len(block)
+
+        self.queued -= num_samples - wanted
+        if not blocks:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate(blocks)
+
+    def close(self):
+        self.queue.clear()
+        self.queued = 0
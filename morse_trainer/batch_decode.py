@@ -0,0 +1,265 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Decode a directory of morse recordings using a pool of processes.
+
+Each recording is split at long silences into segments of roughly equal
+length and every segment is decoded in its own process.  The per-segment
+text is joined back together in order.
+
+A segment (other than the first) starts decoding at an earlier silence
+boundary, the 'overlap', moved back to the start of a block a serial
+decode would read so the levels are updated at the same places.
+Characters decoded in the overlap are thrown away, it is only used to
+let the adaptive recognition state (len_dot, len_dash, signal_threshold,
+...) settle to the values a serial decode would have at the segment
+start.  The overlap and the segment are decoded in one pass, so nothing
+is flushed between them.  Every segment is seeded from the same params
+file as a serial decode would be.
+
+results = decode_directory(directory, jobs=None, segment=60, overlap=10,
+                           params_file=None, frequency=None, rate=None)
+-----------------------------------------------------------------------
+Returns a list of (filename, text) tuples, sorted by filename.
+
+(boundaries, rate) = find_boundaries(filename, rate=None)
+--------------------------------------------------------
+Returns the sample indices where 'filename' may be split, and its rate.
+"""
+
+import os
+import math
+import concurrent.futures
+
+import numpy as np
+
+import envelope
+import goertzel
+import pcm_file
+from receive_morse import ReadMorse
+
+
+# file extensions we will decode
+Extensions = ('.wav', '.pcm', '.raw')
+
+# the silence (in envelope values) that must surround a split point: long
+# enough for the reader to emit the char, space and word space
+SplitGap = ReadMorse.Silence * (2*ReadMorse.CharSpace + ReadMorse.WordSpace + 1)
+
+
+def find_boundaries(filename, rate=None):
+    """Find silence boundaries in a recording.
+
+    filename  path to the recording
+    rate      sample rate of a raw PCM file
+
+    Returns (boundaries, rate) where 'boundaries' is a sorted list of sample
+    indices, each at the start of a sound that follows a long silence, and
+    'rate' is the sample rate of the file.  Starting at a sound gives the
+    reader's level estimator signal as well as noise in its first block.
+    """
+
+    source = pcm_file.PCMFile(filename, rate=rate)
+    chunk = ReadMorse.chunk_size(source.rate)
+    env = envelope.Envelope(chunk=chunk, mode=ReadMorse.EnvelopeMode)
+
+    # envelope of the whole file, a block at a time to keep memory flat
+    values = []
+    while True:
+        data = source.read(ReadMorse.FileBlock)
+        if len(data) == 0:
+            break
+        values.append(env.process(data))
+    source.close()
+    if not values:
+        return ([], source.rate)
+    values = np.concatenate(values)
+
+    peak = np.percentile(values, 99)
+    if peak <= 0:
+        return ([], source.rate)
+    quiet = np.concatenate(([0], (values < peak/4).astype(np.int8), [0]))
+
+    # start and end of each run of quiet values
+    edges = np.diff(quiet)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    long_runs = (ends - starts) >= SplitGap
+    long_runs &= ends < len(values)     # no split after the last sound
+
+    return ([int(end) * chunk for end in ends[long_runs]], source.rate)
+
+def decode_segment(job):
+    """Decode one segment of a recording.
+
+    job  a tuple (filename, rate, warm_start, start, end, params_file,
+         frequency)
+
+    The audio is decoded from 'warm_start' to 'end' in one pass but the
+    characters decoded before 'start' are discarded.  Returns the text
+    decoded from 'start' to 'end'.
+    """
+
+    (filename, rate, warm_start, start, end, params_file, frequency) = job
+
+    source = pcm_file.PCMFile(filename, rate=rate, start=warm_start, end=end)
+
+    detector = None
+    if frequency:
+        chunk = ReadMorse.chunk_size(source.rate)
+        detector = goertzel.Goertzel(frequency=frequency, rate=source.rate,
+                                     chunk=chunk, length=8*chunk)
+
+    morse = ReadMorse(detector=detector, source=source)
+    morse.load_params(params_file)
+
+    # event times are from 'warm_start'
+    skip = (start - warm_start) / source.rate
+
+    result = []
+    while True:
+        data = source.read(morse.block)
+        events = morse.feed(data) if len(data) else morse.finish()
+        result.extend(value for (kind, time, value) in events
+                      if kind != ReadMorse.Element and time >= skip)
+        if len(data) == 0:
+            break
+    morse.close()
+
+    return ''.join(result)
+
+def make_jobs(filename, segment, overlap, params_file, frequency, rate):
+    """Return the list of decode_segment() jobs for one recording."""
+
+    (boundaries, file_rate) = find_boundaries(filename, rate=rate)
+
+    # a segment starts on both a read block and an envelope value boundary
+    align = math.lcm(ReadMorse.FileBlock, ReadMorse.chunk_size(file_rate))
+
+    # split points are boundaries at least 'segment' apart
+    splits = [0]
+    for point in boundaries:
+        if point - splits[-1] >= segment * file_rate:
+            splits.append(point)
+
+    jobs = []
+    for (start, end) in zip(splits, splits[1:] + [None]):
+        # warm up from the latest boundary at least 'overlap' before start,
+        # moved back to where a serial decode starts a block
+        warm_start = start
+        if start:
+            earlier = [0] + [point for point in boundaries
+                             if point <= start - overlap*file_rate]
+            warm_start = earlier[-1] - earlier[-1] % align
+        jobs.append((filename, rate, warm_start, start, end, params_file,
+                     frequency))
+    return jobs
+
+def decode_directory(directory, jobs=None, segment=60, overlap=10,
+                     params_file=None, frequency=None, rate=None):
+    """Decode all recordings in a directory.
+
+    directory    path to the directory of recordings
+    jobs         number of worker processes (None means one per CPU)
+    segment      wanted segment length (seconds)
+    overlap      warm-up length before each segment (seconds)
+    params_file  recognition params file used to seed every segment
+    frequency    if not None, use a Goertzel detector at this frequency
+    rate         sample rate of raw PCM files
+
+    Returns a list of (filename, text) tuples, sorted by filename.
+    """
+
+    filenames = sorted(os.path.join(directory, name)
+                       for name in os.listdir(directory)
+                       if os.path.splitext(name)[1].lower() in Extensions)
+
+    all_jobs = []
+    num_jobs = []
+    for filename in filenames:
+        file_jobs = make_jobs(filename, segment, overlap, params_file,
+                              frequency, rate)
+        all_jobs.extend(file_jobs)
+        num_jobs.append(len(file_jobs))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        texts = list(executor.map(decode_segment, all_jobs))
+
+    # merge per-segment text back into per-file text, in order
+    results = []
+    index = 0
+    for (filename, num) in zip(filenames, num_jobs):
+        results.append((filename, ''.join(texts[index:index+num])))
+        index += num
+    return results
+
+
+if __name__ == '__main__':
+    import sys
+    import getopt
+
+    def usage(msg=None):
+        if msg:
+            print(('*'*80 + '\n%s\n' + '*'*80) % msg)
+        print("\n"
+              "CLI program to decode a directory of morse recordings in\n"
+              "parallel and print the text of each.\n\n"
+              "Usage: batch_decode [-f filename] [-g freq] [-h] [-j jobs]\n"
+              "                    [-o overlap] [-r rate] [-t seconds]\n"
+              "                    directory\n\n"
+              "where -f filename  means read params from filename\n"
+              "      -g freq      means only listen to tone at 'freq' hertz\n"
+              "      -h           means print this help and stop\n"
+              "      -j jobs      means use 'jobs' processes\n"
+              "      -o overlap   means warm up for 'overlap' seconds\n"
+              "      -r rate      means sample rate of raw PCM files\n"
+              "      -t seconds   means split files into 'seconds' segments")
+
+    # parse the CLI params
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'f:g:hj:o:r:t:',
+                                     ['file=', 'goertzel=', 'help', 'jobs=',
+                                      'overlap=', 'rate=', 'time='])
+    except getopt.GetoptError as err:
+        usage(err)
+        sys.exit(1)
+
+    params_file = None
+    frequency = None
+    jobs = None
+    overlap = 10
+    rate = None
+    segment = 60
+    try:
+        for (opt, param) in opts:
+            if opt in ['-f', '--file']:
+                params_file = param
+            elif opt in ['-g', '--goertzel']:
+                frequency = int(param)
+            elif opt in ['-h', '--help']:
+                usage()
+                sys.exit(0)
+            elif opt in ['-j', '--jobs']:
+                jobs = int(param)
+            elif opt in ['-o', '--overlap']:
+                overlap = int(param)
+            elif opt in ['-r', '--rate']:
+                rate = int(param)
+            elif opt in ['-t', '--time']:
+                segment = int(param)
+    except ValueError:
+        usage("Option '%s' must be followed by a number" % opt)
+        sys.exit(1)
+
+    if len(args) != 1:
+        usage('You must give one directory of recordings')
+        sys.exit(1)
+
+    for (filename, text) in decode_directory(args[0], jobs=jobs,
+                                             segment=segment, overlap=overlap,
+                                             params_file=params_file,
+                                             frequency=frequency, rate=rate):
+        print('%s\t%s' % (filename, text))
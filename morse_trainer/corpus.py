@@ -0,0 +1,466 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Generate large labeled corpora of synthetic morse for benchmarking.
+
+Every clip is random groups of characters sent with the SendMorse
+element timing, then made harder:
+    jitter    each element and gap is stretched or shrunk at random
+              (a human fist)
+    speed     the speed changes steadily from the first word to the last
+    drift     the tone frequency moves steadily through the clip
+    QSB       the signal fades in and out (a slow sinusoid)
+    noise     white noise at a given signal to noise ratio (tone power
+              against noise power over the whole band)
+The amount of each is chosen at random per clip from the ranges in the
+options.  A clip is rendered with a few whole-clip numpy operations (no
+per-element loop) and clips are made in parallel by a pool of processes.
+Clip 'i' of a corpus only depends on the seed and 'i', so a corpus is the
+same whatever the number of processes.
+
+A corpus is a directory holding:
+    corpus.json  the settings, and the text of every clip
+    audio.pcm    all the clips, 16 bit signed little-endian samples
+    index.npy    the start, length and chosen parameters of every clip
+generate() returns the corpus already in the directory if it was made
+with the same settings, so it is only built once.
+
+corpus = generate(directory, count, seed=0, jobs=None, options=None)
+--------------------------------------------------------------------
+Build (or reuse) a corpus of 'count' clips.  'options' is a dict
+changing some of DefaultOptions.
+
+corpus = Corpus(directory)
+--------------------------
+Open an existing corpus.
+
+len(corpus), corpus.texts[i], corpus.index[i]
+---------------------------------------------
+The number of clips, the text of a clip and its numpy record of
+parameters (see IndexDtype).
+
+samples = corpus.samples(i)
+---------------------------
+The samples of clip 'i' as a (memory mapped) numpy int16 array.
+
+source = corpus.source(i)
+-------------------------
+A pcm_file.PCMFile reading clip 'i', for a ReadMorse.
+"""
+
+import os
+import json
+import time
+import concurrent.futures
+
+import numpy as np
+
+import pcm_file
+import tracker
+import morse_code
+from send_morse import SendMorse
+from receive_morse import ReadMorse
+
+
+# corpus file format version, part of the cache key
+Version = 1
+
+# sample rate of the clips, the morse reader's rate
+Rate = 8000
+
+# the ranges (low, high) chosen from for each clip
+DefaultOptions = {
+                  'words': (2, 5),          # groups per clip
+                  'group': (1, 5),          # characters per group
+                  'charset': 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
+                  'wpm': (10, 35),          # starting speed
+                  'speed_change': (-0.2, 0.2),  # fraction, start to end
+                  'jitter': (0.0, 0.15),    # element time spread (fraction)
+                  'frequency': (500, 900),  # hertz at the start
+                  'drift': (-40, 40),       # hertz, start to end
+                  'qsb_depth': (0.0, 0.8),  # fraction of the signal faded
+                  'qsb_rate': (0.05, 0.5),  # fades per second
+                  'snr': (5, 30),           # dB
+                  'volume': (0.1, 0.5),     # tone amplitude, full scale 1.0
+                 }
+
+# the parameters chosen for each clip, and its place in audio.pcm
+IndexDtype = np.dtype([('start', '<i8'), ('length', '<i4'),
+                       ('wpm', '<f4'), ('wpm_end', '<f4'),
+                       ('jitter', '<f4'), ('frequency', '<f4'),
+                       ('drift', '<f4'), ('qsb_depth', '<f4'),
+                       ('qsb_rate', '<f4'), ('snr', '<f4'),
+                       ('volume', '<f4')])
+
+# keying edge rise time (seconds), and silence before and after a clip
+RiseTime = 0.005
+Lead = 0.3
+Tail = 0.5
+
+# clips made by one job in the process pool
+BatchSize = 64
+
+# the files in a corpus directory
+SettingsFile = 'corpus.json'
+AudioFile = 'audio.pcm'
+IndexFile = 'index.npy'
+
+# added to the file names while they are written
+TempSuffix = '.tmp'
+
+
+def _uniform(rng, limits):
+    """Return a random float in the range 'limits' (low, high)."""
+
+    (low, high) = limits
+    return float(rng.uniform(low, high)) if high > low else float(low)
+
+def choose_clip(rng, options):
+    """Choose the text and parameters of one clip.
+
+    Returns (text, params) where 'params' is a dict of the IndexDtype
+    parameter fields.
+    """
+
+    charset = options['charset']
+    (low, high) = options['words']
+    num_words = int(rng.integers(low, high+1))
+    (low, high) = options['group']
+    sizes = rng.integers(low, high+1, num_words)
+    text = ' '.join(''.join(rng.choice(list(charset), size))
+                    for size in sizes)
+
+    wpm = _uniform(rng, options['wpm'])
+    params = {
+              'wpm': wpm,
+              'wpm_end': wpm * (1 + _uniform(rng, options['speed_change'])),
+              'jitter': _uniform(rng, options['jitter']),
+              'frequency': _uniform(rng, options['frequency']),
+              'drift': _uniform(rng, options['drift']),
+              'qsb_depth': _uniform(rng, options['qsb_depth']),
+              'qsb_rate': _uniform(rng, options['qsb_rate']),
+              'snr': _uniform(rng, options['snr']),
+              'volume': _uniform(rng, options['volume']),
+             }
+    return (text, params)
+
+def timeline(text, wpm, wpm_end):
+    """Return the keying of 'text' as numpy (durations, keyed) arrays.
+
+    The element times are SendMorse's at a speed moving linearly from
+    'wpm' for the first word to 'wpm_end' for the last.
+    """
+
+    words = text.split()
+    speeds = np.linspace(wpm, wpm_end, len(words))
+    sender = SendMorse(cwpm=wpm, wpm=wpm)
+    tree = morse_code.Tree
+
+    durations = []
+    for (word, speed) in zip(words, speeds):
+        speed = round(float(speed), 1)      # few distinct settings
+        sender.set_speeds(speed, speed)
+
+        # a mark then the gap after it, for every element of the word
+        dashes = np.array([dash for char in word
+                           for dash in tree.elements(char)])
+        ends = np.cumsum([morse_code.Lengths[char] for char in word]) - 1
+        gaps = np.full(len(dashes), sender.inter_elem_time)
+        gaps[ends] = sender.inter_char_time
+        gaps[-1] = sender.inter_word_time
+        marks = np.where(dashes, sender.dash_time, sender.dot_time)
+        durations.append(np.stack((marks, gaps), axis=1).ravel())
+
+    durations = np.concatenate(durations)
+    keyed = np.zeros(len(durations), dtype=bool)
+    keyed[::2] = True
+    return (durations, keyed)
+
+def render_clip(text, params, rng, rate=Rate):
+    """Render one clip, return its int16 samples."""
+
+    (durations, keyed) = timeline(text, params['wpm'], params['wpm_end'])
+
+    # the fist: every mark and gap stretched or shrunk on its own
+    if params['jitter'] > 0:
+        durations = durations * np.clip(rng.normal(1, params['jitter'],
+                                                   len(durations)), 0.3, 3)
+
+    # key down/up sample positions, then the keying as a 0/1 array
+    edges = np.concatenate(([Lead], Lead + np.cumsum(durations)))
+    edges = np.round(edges * rate).astype(np.int64)
+    length = int(edges[-1] + round(Tail * rate))
+    key = np.zeros(length + 1)
+    np.add.at(key, edges[:-1][keyed], 1)
+    np.add.at(key, edges[1:][keyed], -1)
+    key = np.cumsum(key[:length])
+
+    # soften the key clicks
+    ramp = np.hanning(max(3, int(RiseTime * rate)))
+    key = np.convolve(key, ramp / ramp.sum(), 'same')
+
+    # the drifting, fading tone
+    t = np.arange(length) / rate
+    frequency = params['frequency'] + params['drift'] * t / t[-1]
+    phase = 2 * np.pi * np.cumsum(frequency) / rate
+    fade = np.cos(2*np.pi*params['qsb_rate']*t + rng.uniform(0, 2*np.pi))
+    fade = 1 - params['qsb_depth'] * (0.5 - 0.5*fade)
+    signal = params['volume'] * key * fade * np.sin(phase)
+
+    # noise power from the tone power (volume**2 / 2)
+    sigma = params['volume'] / np.sqrt(2 * 10**(params['snr']/10))
+    signal += rng.normal(0, sigma, length)
+
+    return (np.clip(signal, -1, 1) * 32767).astype('<i2')
+
+def make_clips(job):
+    """Make a batch of clips.
+
+    job  a tuple (seed, first, last, options)
+
+    Returns a list of (text, params, samples) for clips first to last-1.
+    """
+
+    (seed, first, last, options) = job
+
+    clips = []
+    for i in range(first, last):
+        rng = np.random.default_rng([seed, i])
+        (text, params) = choose_clip(rng, options)
+        clips.append((text, params, render_clip(text, params, rng)))
+    return clips
+
+def _settings(count, seed, options):
+    """Return the settings dict that identifies a corpus."""
+
+    return {'version': Version, 'rate': Rate, 'count': count, 'seed': seed,
+            'options': options}
+
+def generate(directory, count, seed=0, jobs=None, options=None):
+    """Build a corpus of 'count' clips, or reuse the one there.
+
+    directory  the corpus directory, created if needed
+    count      the number of clips
+    seed       the random seed, the same seed gives the same corpus
+    jobs       number of worker processes (None means one per CPU)
+    options    dict of changes to DefaultOptions
+
+    Returns the Corpus.
+    """
+
+    all_options = dict(DefaultOptions)
+    all_options.update(options or {})
+    # as it would be read back from the JSON file
+    all_options = json.loads(json.dumps(all_options))
+    settings = _settings(count, seed, all_options)
+
+    try:
+        corpus = Corpus(directory)
+        if corpus.settings == settings:
+            return corpus
+        del corpus                  # let go of the old audio
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    # the settings file goes first so an interrupted build is never
+    # taken for the old corpus, the new files replace the old at the end
+    os.makedirs(directory, exist_ok=True)
+    settings_path = os.path.join(directory, SettingsFile)
+    if os.path.exists(settings_path):
+        os.remove(settings_path)
+    audio_path = os.path.join(directory, AudioFile)
+    index_path = os.path.join(directory, IndexFile)
+    batches = [(seed, first, min(first + BatchSize, count), all_options)
+               for first in range(0, count, BatchSize)]
+
+    index = np.zeros(count, dtype=IndexDtype)
+    texts = []
+    start = 0
+    with open(audio_path + TempSuffix, 'wb') as fd:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            for clips in executor.map(make_clips, batches):
+                for (text, params, samples) in clips:
+                    record = index[len(texts)]
+                    for (name, value) in params.items():
+                        record[name] = value
+                    record['start'] = start
+                    record['length'] = len(samples)
+                    texts.append(text)
+                    fd.write(samples.tobytes())
+                    start += len(samples)
+
+    with open(index_path + TempSuffix, 'wb') as fd:
+        np.save(fd, index)
+    os.replace(audio_path + TempSuffix, audio_path)
+    os.replace(index_path + TempSuffix, index_path)
+
+    # written last, a corpus without it is incomplete
+    settings['texts'] = texts
+    with open(settings_path + TempSuffix, 'w') as fd:
+        json.dump(settings, fd)
+    os.replace(settings_path + TempSuffix, settings_path)
+
+    return Corpus(directory)
+
+
+class Corpus:
+    """A corpus of labeled clips on disk."""
+
+    def __init__(self, directory):
+        """Open the corpus in 'directory'."""
+
+        self.directory = directory
+        with open(os.path.join(directory, SettingsFile)) as fd:
+            settings = json.load(fd)
+        self.texts = settings.pop('texts')
+        self.settings = settings
+        self.rate = settings['rate']
+        self.index = np.load(os.path.join(directory, IndexFile))
+
+        self.audio_file = os.path.join(directory, AudioFile)
+        self.audio = np.memmap(self.audio_file, dtype='<i2', mode='r')
+
+    def __len__(self):
+        return len(self.index)
+
+    def samples(self, i):
+        """Return the samples of clip 'i'."""
+
+        (start, length) = (self.index[i]['start'], self.index[i]['length'])
+        return self.audio[start:start+length]
+
+    def source(self, i):
+        """Return a pcm_file.PCMFile reading clip 'i'."""
+
+        start = int(self.index[i]['start'])
+        end = start + int(self.index[i]['length'])
+        return pcm_file.PCMFile(self.audio_file, rate=self.rate, start=start,
+                                end=end)
+
+
+def decode_clips(job):
+    """Decode a batch of clips with fresh ReadMorse objects.
+
+    job  a tuple (directory, first, last, track), 'track' is True if the
+         reader uses a tracker.ToneTracker
+
+    Returns a list of (text, seconds) for clips first to last-1.
+    """
+
+    (directory, first, last, track) = job
+    corpus = Corpus(directory)
+    chunk = ReadMorse.chunk_size(corpus.rate)
+
+    results = []
+    for i in range(first, last):
+        detector = None
+        if track:
+            detector = tracker.ToneTracker(rate=corpus.rate, chunk=chunk,
+                                           length=8*chunk)
+        morse = ReadMorse(detector=detector, source=corpus.source(i))
+        chars = []
+        start = time.perf_counter()
+        try:
+            while True:
+                chars.append(morse.read_morse())
+        except EOFError:
+            pass
+        results.append((''.join(chars), time.perf_counter() - start))
+        morse.close()
+    return results
+
+
+if __name__ == '__main__':
+    import sys
+    import getopt
+
+    import replay
+
+    def usage(msg=None):
+        if msg:
+            print(('*'*80 + '\n%s\n' + '*'*80) % msg)
+        print("\n"
+              "CLI program to build a corpus of synthetic morse clips, and\n"
+              "optionally decode them all and show the error rates.\n\n"
+              "Usage: corpus [-c count] [-d] [-h] [-j jobs] [-s seed] [-t]\n"
+              "              directory\n\n"
+              "where -c count  means make 'count' clips (default 1000)\n"
+              "      -d        means decode the clips and show error rates\n"
+              "      -h        means print this help and stop\n"
+              "      -j jobs   means use 'jobs' processes\n"
+              "      -s seed   means use 'seed' for the random numbers\n"
+              "      -t        means decode with the sidetone tracker")
+
+    # parse the CLI params
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'c:dhj:s:t',
+                                     ['count=', 'decode', 'help', 'jobs=',
+                                      'seed=', 'track'])
+    except getopt.GetoptError as err:
+        usage(err)
+        sys.exit(1)
+
+    count = 1000
+    decode = False
+    jobs = None
+    seed = 0
+    track = False
+    try:
+        for (opt, param) in opts:
+            if opt in ['-c', '--count']:
+                count = int(param)
+            elif opt in ['-d', '--decode']:
+                decode = True
+            elif opt in ['-h', '--help']:
+                usage()
+                sys.exit(0)
+            elif opt in ['-j', '--jobs']:
+                jobs = int(param)
+            elif opt in ['-s', '--seed']:
+                seed = int(param)
+            elif opt in ['-t', '--track']:
+                track = True
+    except ValueError:
+        usage("Option '%s' must be followed by a number" % opt)
+        sys.exit(1)
+
+    if len(args) != 1:
+        usage('You must give one corpus directory')
+        sys.exit(1)
+
+    start = time.time()
+    corpus = generate(args[0], count, seed=seed, jobs=jobs)
+    seconds = sum(corpus.index['length']) / corpus.rate
+    print('%d clips, %.0f seconds of audio, %.1f MB, ready in %.1fs'
+          % (len(corpus), seconds, os.path.getsize(corpus.audio_file) / 1e6,
+             time.time() - start))
+
+    if not decode:
+        sys.exit(0)
+
+    start = time.time()
+    batches = [(args[0], first, min(first + BatchSize, len(corpus)), track)
+               for first in range(0, len(corpus), BatchSize)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = [result for batch in executor.map(decode_clips, batches)
+                   for result in batch]
+    print('decoded in %.1fs' % (time.time() - start))
+
+    # character error rate by signal to noise ratio
+    errors = np.zeros(len(corpus))
+    lengths = np.zeros(len(corpus))
+    for (i, (text, _)) in enumerate(results):
+        (errors[i], lengths[i]) = replay.compare(text, corpus.texts[i])
+    snr = corpus.index['snr']
+    print('%-12s %6s %8s' % ('snr (dB)', 'clips', 'errors'))
+    for low in range(int(snr.min()) // 5 * 5, int(snr.max()) + 1, 5):
+        selected = (snr >= low) & (snr < low + 5)
+        if selected.any():
+            print('%3d to %-5d %6d %7.1f%%'
+                  % (low, low + 5, selected.sum(),
+                     100 * errors[selected].sum() / lengths[selected].sum()))
+    print('%-12s %6d %7.1f%%'
+          % ('all', len(corpus), 100 * errors.sum() / lengths.sum()))
@@ -0,0 +1,168 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Vectorized envelope detection for the morse reader.
+
+Raw audio samples are turned into signed (count, level) tokens in two
+stages.  Both stages work on large numpy blocks rather than one small
+chunk at a time.
+
+env = Envelope(chunk=16, mode='abs')
+------------------------------------
+Front-end that decimates a block of samples to one envelope value per
+'chunk' samples.  'mode' is 'abs' (average absolute value) or 'rms'.
+
+values = env.process(samples)
+-----------------------------
+Return an integer numpy array of envelope values for 'samples'.
+
+hyst = Hysteresis(silence=20, hold=2)
+-------------------------------------
+The SOUND/SILENCE state machine that turns envelope values into tokens.
+
+hyst.push(values)
+-----------------
+Append envelope values to the internal buffer.
+
+token = hyst.next(threshold)
+----------------------------
+Return the next (count, level) token or None if more values are needed.
+The tokens are:
+    (-N, level)  silence for N envelope values
+    (N, level)   N envelope values of sound (terminated by silence)
+
+hyst.position is the number of envelope values consumed so far and
+hyst.sound_start the position at which the last SOUND started.
+"""
+
+import numpy as np
+
+
+class Envelope:
+    """Decimate raw audio samples to an amplitude envelope."""
+
+    # envelope modes
+    Modes = ('abs', 'rms')
+
+    def __init__(self, chunk=16, mode='abs'):
+        """Prepare the envelope detector.
+
+        chunk  number of samples averaged into one envelope value
+        mode   'abs' for average absolute value, 'rms' for RMS value
+        """
+
+        if mode not in Envelope.Modes:
+            raise Exception("Envelope mode must be one of %s, got '%s'"
+                            % (str(Envelope.Modes), mode))
+
+        self.chunk = chunk
+        self.mode = mode
+
+        # samples left over from the previous block (less than one chunk)
+        self.residue = np.zeros(0, dtype=np.int32)
+
+    def process(self, samples):
+        """Return envelope values for a block of samples.
+
+        samples  a numpy array (or bytes of int16 data) of audio samples
+
+        Any trailing partial chunk is kept and used with the next block.
+        """
+
+        if isinstance(samples, (bytes, bytearray)):
+            samples = np.frombuffer(samples, dtype=np.int16)
+
+        # widen so abs(-32768) and squares don't overflow
+        data = np.concatenate((self.residue, samples.astype(np.int32)))
+
+        num_chunks = len(data) // self.chunk
+        used = num_chunks * self.chunk
+        self.residue = data[used:]
+
+        chunks = data[:used].reshape(num_chunks, self.chunk)
+        if self.mode == 'abs':
+            return np.abs(chunks).sum(axis=1) // self.chunk
+        squares = (chunks.astype(np.int64)**2).sum(axis=1) // self.chunk
+        return np.sqrt(squares).astype(np.int64)
+
+
+class Hysteresis:
+    """Turn envelope values into signed (count, level) tokens."""
+
+    # state values
+    S_SOUND = 1
+    S_SILENCE = 2
+
+    def __init__(self, silence=20, hold=2):
+        """Prepare the state machine.
+
+        silence  number of quiet values that is reported as SILENCE
+        hold     number of consecutive quiet values that ends a SOUND
+        """
+
+        self.silence = silence
+        self.hold = hold
+        self.state = Hysteresis.S_SILENCE
+        self.buffer = np.zeros(0, dtype=np.int64)
+        self.position = 0           # envelope values consumed
+        self.sound_start = 0        # position of the start of the last SOUND
+
+    def reset(self):
+        """Forget buffered values and start again in SILENCE state.
+
+        The position keeps counting from where it was.
+        """
+
+        self.state = Hysteresis.S_SILENCE
+        self.buffer = np.zeros(0, dtype=np.int64)
+
+    def push(self, values):
+        """Append envelope values to the buffer."""
+
+        self.buffer = np.concatenate((self.buffer, values))
+
+    def next(self, threshold):
+        """Return the next token using 'threshold', or None if starved.
+
+        Values at or above 'threshold' are SOUND, values below are quiet.
+        """
+
+        if self.state == Hysteresis.S_SILENCE:
+            window = self.buffer[:self.silence]
+            loud = np.flatnonzero(window >= threshold)
+            if len(loud):
+                # we have a signal, SOUND starts after the first loud value
+                self.sound_start = self.position + int(loud[0])
+                self.buffer = self.buffer[loud[0]+1:]
+                self.position += int(loud[0]) + 1
+                self.state = Hysteresis.S_SOUND
+            elif len(window) < self.silence:
+                return None
+            else:
+                self.buffer = self.buffer[self.silence:]
+                self.position += self.silence
+                return (-self.silence, int(window.sum()) // self.silence)
+
+        # in SOUND state, look for 'hold' consecutive quiet values
+        quiet = (self.buffer < threshold).astype(np.int8)
+        if len(quiet) < self.hold:
+            return None
+        if self.hold == 1:
+            ends = np.flatnonzero(quiet)
+        else:
+            runs = np.convolve(quiet, np.ones(self.hold, dtype=np.int8), 'valid')
+            ends = np.flatnonzero(runs == self.hold)
+        if not len(ends):
+            return None
+
+        first_quiet = int(ends[0])
+        end = first_quiet + self.hold
+        values = self.buffer[:end]
+        count = first_quiet - int(quiet[:first_quiet].sum())
+
+        self.buffer = self.buffer[end:]
+        self.position += end
+        self.state = Hysteresis.S_SILENCE
+
+        return (count, int(values.sum()) // len(values))
@@ -0,0 +1,117 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Narrowband tone detector front-end for the morse reader.
+
+A sliding Goertzel (single bin DFT) filter tuned to the sidetone
+frequency.  It has the same interface as envelope.Envelope so either can
+feed the envelope.Hysteresis state machine, but noise away from the
+sidetone frequency is ignored.
+
+det = Goertzel(frequency=750, rate=8000, chunk=16, length=128)
+--------------------------------------------------------------
+'length' is the filter window in samples (a multiple of 'chunk').  The
+filter bandwidth is about rate/length hertz.
+
+values = det.process(samples)
+-----------------------------
+Return an integer numpy array with one value per 'chunk' samples.  The
+value is the tone amplitude scaled to match the 'abs' envelope.
+
+det.set_frequency(frequency)
+----------------------------
+Retune the filter and start again.
+
+det.retune(frequency)
+---------------------
+Retune the filter keeping its state, for following a drifting tone
+without a gap in the output.
+"""
+
+import math
+import numpy as np
+
+
+class Goertzel:
+    """Sliding Goertzel filter producing a narrowband envelope."""
+
+    def __init__(self, frequency=750, rate=8000, chunk=16, length=128):
+        """Prepare the detector.
+
+        frequency  the tone frequency to detect (hertz)
+        rate       the sample rate (samples/second)
+        chunk      number of samples per output value
+        length     filter window length in samples
+        """
+
+        if length % chunk:
+            raise Exception('Goertzel length (%d) must be a multiple of '
+                            'chunk (%d)' % (length, chunk))
+
+        self.rate = rate
+        self.chunk = chunk
+        self.length = length
+        self.num_partials = length // chunk
+
+        # a sine of amplitude A gives sum magnitude A*length/2, and the
+        # average absolute value of that sine is A*2/pi
+        self.scale = (2 / length) * (2 / math.pi)
+
+        self.set_frequency(frequency)
+
+    def set_frequency(self, frequency):
+        """Tune the detector to 'frequency' and reset the filter state."""
+
+        self.retune(frequency)
+
+        self.phase = 1 + 0j
+        self.residue = np.zeros(0, dtype=np.float64)
+        self.partials = np.zeros(self.num_partials - 1, dtype=np.complex128)
+
+    def retune(self, frequency):
+        """Tune the detector to 'frequency' keeping the filter state.
+
+        The phase carries on from where the old frequency left it, so the
+        partial sums already in the window still add up for a tone close
+        to both frequencies.
+        """
+
+        self.frequency = frequency
+
+        # precomputed coefficients for one chunk, and the phase step per chunk
+        omega = 2 * math.pi * frequency / self.rate
+        self.coeffs = np.exp(-1j * omega * np.arange(self.chunk))
+        self.rotate = np.exp(-1j * omega * self.chunk)
+
+    def process(self, samples):
+        """Return narrowband envelope values for a block of samples.
+
+        samples  a numpy array (or bytes of int16 data) of audio samples
+        """
+
+        if isinstance(samples, (bytes, bytearray)):
+            samples = np.frombuffer(samples, dtype=np.int16)
+
+        data = np.concatenate((self.residue, samples.astype(np.float64)))
+
+        num_chunks = len(data) // self.chunk
+        used = num_chunks * self.chunk
+        self.residue = data[used:]
+        if num_chunks == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        # DFT term of each chunk, phase referenced to the start of the stream
+        chunks = data[:used].reshape(num_chunks, self.chunk)
+        phases = self.phase * self.rotate**np.arange(num_chunks)
+        partials = (chunks @ self.coeffs) * phases
+        self.phase = phases[-1] * self.rotate
+        self.phase /= abs(self.phase)
+
+        # sum each window of 'num_partials' chunk terms with a cumulative sum
+        partials = np.concatenate((self.partials, partials))
+        totals = np.concatenate(([0], np.cumsum(partials)))
+        windows = totals[self.num_partials:] - totals[:-self.num_partials]
+        self.partials = partials[len(partials)-self.num_partials+1:]
+
+        return (np.abs(windows) * self.scale).astype(np.int64)
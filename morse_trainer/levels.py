@@ -0,0 +1,123 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Running noise floor and signal peak estimates for the morse reader.
+
+The envelope values of the last few seconds are kept in a fixed numpy
+ring buffer.  Once per block of input the noise floor is taken as a low
+percentile of the window and the signal peak as a high percentile, so
+one loud click or one weak dot hardly moves either.  The peak follows a
+louder signal at once but falls back slowly (an exponential decay) so a
+pause in the sending doesn't pull the threshold down into the noise.
+
+The SOUND/SILENCE threshold is set part way between the two, and never
+closer to the noise than 'MinRatio' times the floor, so a quiet room
+doesn't make noise into marks.
+
+levels = LevelEstimator(value_time, window=4.0, noise=500, peak=30000)
+----------------------------------------------------------------------
+'value_time' is the time of one envelope value and 'window' the seconds
+of values kept.  'noise' and 'peak' are used until the first block of
+values.
+
+levels.update(values)
+---------------------
+Add a block of envelope values and update the estimates.
+
+levels.reset(noise, peak)
+-------------------------
+Forget the values and start again from the given levels.
+
+levels.noise, levels.peak, levels.threshold
+-------------------------------------------
+The current noise floor, signal peak and SOUND/SILENCE threshold.
+
+levels.snr
+----------
+The signal to noise ratio in dB (peak against noise floor).
+"""
+
+import math
+
+import numpy as np
+
+import audio
+
+
+class LevelEstimator:
+    """Noise floor and signal peak from a window of envelope values."""
+
+    # percentiles of the window taken as the noise floor and signal peak
+    NoisePercentile = 25
+    PeakPercentile = 95
+
+    # fraction of the peak left after a second of falling
+    PeakDecay = 0.7
+
+    # the threshold is this fraction of the way from noise to peak ...
+    Fraction = 0.5
+
+    # ... but at least this many times the noise floor
+    MinRatio = 2.0
+
+    def __init__(self, value_time, window=4.0, noise=500, peak=30000):
+        """Prepare the estimator.
+
+        value_time  seconds per envelope value
+        window      seconds of envelope values used
+        noise       noise floor used until the first values
+        peak        signal peak used until the first values
+        """
+
+        self.value_time = value_time
+        self.size = max(1, int(round(window / value_time)))
+        self.values = np.zeros(self.size, dtype=np.int64)
+        self.reset(noise, peak)
+
+    def reset(self, noise, peak):
+        """Forget all values, start from the given levels."""
+
+        self.count = 0          # values ever added
+        self.noise = noise
+        self.peak = peak
+        self.threshold = self._threshold()
+
+    def _threshold(self):
+        """Return the SOUND/SILENCE threshold for the current levels."""
+
+        fraction = LevelEstimator.Fraction
+        threshold = self.noise + (self.peak - self.noise)*fraction
+        return int(max(threshold, self.noise*LevelEstimator.MinRatio, 1))
+
+    @property
+    def snr(self):
+        """The signal to noise ratio in dB."""
+
+        return 20 * math.log10(max(self.peak, 1) / max(self.noise, 1))
+
+    def update(self, values):
+        """Add a block of envelope values, update the estimates."""
+
+        num = len(values)
+        if not num:
+            return
+
+        fresh = not self.count
+
+        # put the newest values in the ring, oldest overwritten
+        values = values[-self.size:]
+        audio.ring_write(self.values, self.count, values)
+        self.count += len(values)
+
+        window = self.values[:min(self.count, self.size)]
+        (noise, peak) = np.percentile(window, [LevelEstimator.NoisePercentile,
+                                               LevelEstimator.PeakPercentile])
+
+        self.noise = float(noise)
+        if fresh or peak >= self.peak:
+            self.peak = float(peak)
+        else:
+            decay = LevelEstimator.PeakDecay ** (num * self.value_time)
+            self.peak = float(peak + (self.peak - peak)*decay)
+        self.threshold = self._threshold()
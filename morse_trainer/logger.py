@@ -9,6 +9,20 @@ Simple usage:
     log('A line in the log at the default level (DEBUG)')   # simple
     log('A log line at WARN level', logger.Log.WARN)        # hard to use
     log.info('log line issued at INFO level')               # best if using level
+    log.debug('value=%d, level=%d', value, level)           # best in loops
+
+The level methods take the format arguments separately and only format
+the line if it will be logged, so a disabled debug line costs a
+comparison.  Lines are buffered and written to the file at most every
+'flush_interval' seconds (and at once for ERROR and above), call
+log.flush() to force them out.
+
+With 'threaded=True' the caller only appends a record to a bounded queue
+and a writer thread wakes a few times a second to format and write the
+queued records in one batch, so a slow disk never holds up the caller.
+If the queue is full the record is dropped and counted, the counts are
+written in the trailer by log.close().  Anything logged after close()
+(eg, by a thread still running at exit) is ignored.
 
 Based on the 'borg' recipe from [http://code.activestate.com/recipes/66531/].
 
@@ -19,8 +33,11 @@ Log output includes the module and line # of the log() call.
 
 import os
 import sys
+import time
+import collections
+import atexit
 import datetime
-import traceback
+import threading
 
 
 ################################################################################
@@ -55,21 +72,54 @@ class Log(object):
     # default maximum length of filename (enforced)
     DefaultMaxFname = 15
 
+    # default time (seconds) lines are buffered for before writing
+    DefaultFlushInterval = 1.0
+
+    # size of the file buffer
+    BufferSize = 64 * 1024
+
+    # default number of records queued for the writer thread, and the
+    # time (seconds) the thread sleeps between batches
+    DefaultQueueSize = 10000
+    WriterPeriod = 0.05
 
     def __init__(self, logfile=None, level=NOTSET, append=False,
-                 max_fname=DefaultMaxFname):
+                 max_fname=DefaultMaxFname,
+                 flush_interval=DefaultFlushInterval, threaded=False,
+                 queue_size=DefaultQueueSize):
         """Initialise the logging object.
 
-        logfile  the path to the log file
-        level    logging level - don't log below this level
-        append   True if log file is appended to
+        logfile         the path to the log file
+        level           logging level - don't log below this level
+        append          True if log file is appended to
+        flush_interval  most seconds a line waits in the buffer
+        threaded        True if a writer thread does the file writes
+        queue_size      most records waiting for the writer thread
         """
 
         # make sure we have same state as all other log objects
         self.__dict__ = Log.__shared_state
 
+        # finish with any previous log file
+        if 'logfd' in self.__dict__:
+            self.close()
+        else:
+            atexit.register(self.close)
+
         # set some initial state
         self.max_fname = max_fname
+        self.flush_interval = flush_interval
+        self.last_flush = time.time()
+        self.last_second = None         # (second, 'hh:mm:ss') cache
+        self.num_records = 0            # records written
+        self.dropped = {}               # records dropped, by level
+        self.queue = None
+        self.queue_size = queue_size
+        self.writer = None
+        self.write_lock = threading.Lock()
+        self.queue_lock = threading.Lock()
+        self.stop = threading.Event()
+        self.closed = True             # until the log file is open
         self.sym_level = 'NOTSET'      # set in call to check_level()
         self.level = self.check_level(level)
 
@@ -95,19 +145,29 @@ class Log(object):
                 logfile = os.path.join('~', basefile)
 
         # try to open logfile again
-        self.logfd = open(logfile, log_options)
+        self.logfd = open(logfile, log_options, buffering=Log.BufferSize)
 
         self.logfile = logfile
+        self.closed = False
+
+        if threaded:
+            self.queue = collections.deque()
+            self.stop.clear()
+            self.writer = threading.Thread(target=self._writer,
+                                           name='log writer', daemon=True)
+            self.writer.start()
 
         # announce time+date of opening logging and logging level
-        self.debug('='*55)
-        self.debug('Log started on %s, log level=%s'
-                   % (datetime.datetime.now().ctime(),
-                      self._level_num_to_name[level]))
-        self.debug('-'*55)
+        # (the lines show where the log object was made)
+        if self.DEBUG >= self.level:
+            self._write(self.DEBUG, '='*55, ())
+            self._write(self.DEBUG, 'Log started on %s, log level=%s',
+                        (datetime.datetime.now().ctime(),
+                         self._level_num_to_name.get(self.level, self.level)))
+            self._write(self.DEBUG, '-'*55, ())
 
         # finally, set some internal state
-        self.set_level(self.level)
+        self._set_level(self.level, depth=3)
 
     def check_level(self, level):
         """Check the level value for legality.
@@ -134,20 +194,27 @@ class Log(object):
     def set_level(self, level):
         """Set logging level."""
 
+        self._set_level(level, depth=3)
+
+    def _set_level(self, level, depth):
+        """Set logging level, log it as called from 'depth' frames back."""
+
         level = self.check_level(level)
 
         # convert numeric level to symbolic
         sym = self._level_num_to_name.get(level, None)
         if sym is None:
             # not recognized symbolic but it's legal, so interpret as 'XXXX+2'
-            sym_10 = 10 * (level/10)
+            sym_10 = 10 * (level//10)
             sym_rem = level - sym_10
             sym = '%s+%d' % (self._level_num_to_name[sym_10], sym_rem)
 
         self.level = level
         self.sym_level = sym
 
-        self.critical('Logging level set to %02d (%s)' % (level, sym))
+        if self.CRITICAL >= self.level:
+            self._write(self.CRITICAL, 'Logging level set to %02d (%s)',
+                        (level, sym), depth=depth)
 
     def __call__(self, msg=None, level=None):
         """Call on the logging object.
@@ -164,63 +231,191 @@ class Log(object):
         if level < self.level or self.level < 0:
             return
 
+        self._write(level, msg, ())
+
+    def _write(self, level, msg, args, depth=2):
+        """Log one record, or queue it for the writer thread.
+
+        level  level to log 'msg' at
+        msg    message string, or format string if 'args'
+        args   tuple of arguments for the format string
+        depth  number of frames from here back to the caller
+        """
+
+        # after close() don't even look for the caller
+        if self.closed:
+            return
+
+        record = self._record(level, msg, args, depth+1)
+
+        # the closed check, size check and the append (or drop count) must
+        # be one step when several threads log, the writer only takes from
+        # the queue
+        with self.queue_lock:
+            if self.closed:
+                return
+            if self.queue is not None:
+                if len(self.queue) < self.queue_size:
+                    self.queue.append(record)
+                else:
+                    self.dropped[level] = self.dropped.get(level, 0) + 1
+                return
+
+        with self.write_lock:
+            if not self.logfd.closed:
+                self._output((record,))
+
+    def _record(self, level, msg, args, depth):
+        """Return a log record made 'depth' frames back from here."""
+
+        frame = sys._getframe(depth)
+        return (time.time(), level, frame.f_code.co_filename,
+                frame.f_lineno, msg, args)
+
+    def _format(self, record):
+        """Return the log line for one record."""
+
+        (now, level, fpath, lnum, msg, args) = record
+
         if msg is None:
             msg = ''
+        elif args:
+            msg = msg % args
+
+        # get time, the hh:mm:ss part only changes once a second
+        second = int(now)
+        if self.last_second is None or self.last_second[0] != second:
+            self.last_second = (second, time.strftime('%H:%M:%S',
+                                                      time.localtime(now)))
+        usec = int((now - second) * 1000000)
+
+        # get string for log level and the caller module name
+        loglevel = self._level_num_to_name.get(level, str(level))
+        fname = os.path.basename(fpath).rsplit('.', 1)[0][:self.max_fname]
+
+        return ('%s.%06d|%8s|%*s:%-4d|%s\n'
+                % (self.last_second[1], usec, loglevel,
+                   self.max_fname, fname, lnum, msg))
+
+    def _output(self, records):
+        """Format and buffer a list of records."""
+
+        serious = False
+        for record in records:
+            self.logfd.write(self._format(record))
+            serious = serious or record[1] >= self.ERROR
+        self.num_records += len(records)
+
+        # write the buffer out now and then, and for anything serious
+        now = records[-1][0]
+        if serious or now - self.last_flush >= self.flush_interval:
+            self.logfd.flush()
+            self.last_flush = now
+
+    def _drain(self):
+        """Write out all the queued records."""
+
+        with self.write_lock:
+            records = []
+            try:
+                while True:
+                    records.append(self.queue.popleft())
+            except IndexError:
+                pass
+            if records and not self.logfd.closed:
+                self._output(records)
+
+    def _writer(self):
+        """Writer thread, write queued records until stopped."""
+
+        while not self.stop.wait(Log.WriterPeriod):
+            self._drain()
+
+    def flush(self):
+        """Write any buffered (or queued) lines to the log file."""
+
+        if getattr(self, 'logfd', None) is None or self.closed:
+            return
 
-        # get time
-        to = datetime.datetime.now()
-        hr = to.hour
-        min = to.minute
-        sec = to.second
-        msec = to.microsecond
+        if self.queue is not None:
+            self._drain()
+        with self.write_lock:
+            if not self.logfd.closed:
+                self.logfd.flush()
+                self.last_flush = time.time()
 
-        # caller information - look back for first module != <this module name>
-        frames = traceback.extract_stack()
-        frames.reverse()
-        try:
-            (_, mod_name) = __name__.rsplit('.', 1)
-        except ValueError:
-            mod_name = __name__
-        for (fpath, lnum, mname, _) in frames:
-            fname = os.path.basename(fpath).rsplit('.', 1)
-            if len(fname) > 1:
-                fname = fname[0]
-            if fname != mod_name:
-                break
-
-        # get string for log level
-        loglevel = self._level_num_to_name[level]
-
-        fname = fname[:self.max_fname]
-        self.logfd.write('%02d:%02d:%02d.%06d|%8s|%*s:%-4d|%s\n'
-                         % (hr, min, sec, msec, loglevel, self.max_fname,
-                            fname, lnum, msg))
-        self.logfd.flush()
-
-    def critical(self, msg):
+    def close(self):
+        """Write the trailer and close the log file.
+
+        The trailer has the number of records written and dropped.
+        """
+
+        if getattr(self, 'logfd', None) is None:
+            return
+
+        # from now on nothing more is queued or written by _write()
+        with self.queue_lock:
+            if self.closed:
+                return
+            self.closed = True
+            counts = dict(self.dropped)
+
+        if self.writer is not None:
+            self.stop.set()
+            self.writer.join()
+            self.writer = None
+        if self.queue is not None:
+            self._drain()
+
+        # under the lock so writes that got past 'closed' are counted
+        with self.write_lock:
+            dropped = sum(counts.values())
+            trailer = []
+            if self.DEBUG >= self.level:
+                trailer.append(self._record(self.DEBUG, '-'*55, (), 1))
+                trailer.append(self._record(self.DEBUG,
+                                            'Log closed, %d records written, '
+                                            '%d dropped',
+                                            (self.num_records + 1, dropped), 1))
+            if dropped and self.WARN >= self.level:
+                counts = ['%s=%d' % (self._level_num_to_name.get(level, level),
+                                     num)
+                          for (level, num) in sorted(counts.items())]
+                trailer.append(self._record(self.WARN, 'Dropped: %s',
+                                            (', '.join(counts),), 1))
+            if trailer:
+                self._output(trailer)
+            self.logfd.close()
+
+    def critical(self, msg, *args):
         """Log a message at CRITICAL level."""
 
-        self(msg, self.CRITICAL)
+        if self.CRITICAL >= self.level:
+            self._write(self.CRITICAL, msg, args)
 
-    def error(self, msg):
+    def error(self, msg, *args):
         """Log a message at ERROR level."""
 
-        self(msg, self.ERROR)
+        if self.ERROR >= self.level:
+            self._write(self.ERROR, msg, args)
 
-    def warn(self, msg):
+    def warn(self, msg, *args):
         """Log a message at WARN level."""
 
-        self(msg, self.WARN)
+        if self.WARN >= self.level:
+            self._write(self.WARN, msg, args)
 
-    def info(self, msg):
+    def info(self, msg, *args):
         """Log a message at INFO level."""
 
-        self(msg, self.INFO)
+        if self.INFO >= self.level:
+            self._write(self.INFO, msg, args)
 
-    def debug(self, msg):
+    def debug(self, msg, *args):
         """Log a message at DEBUG level."""
 
-        self(msg, self.DEBUG)
+        if self.DEBUG >= self.level:
+            self._write(self.DEBUG, msg, args)
 
 #    def __del__(self):
 #        """Close the logging."""
@@ -0,0 +1,165 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+The morse code table, and an integer-coded lookup walked one element at
+a time.
+
+Every encoder and decoder uses the one table here.  Built once at import:
+
+Codes       dict mapping characters to morse strings ('A': '.-')
+Chars       dict mapping morse strings to characters ('.-': 'A')
+Tree        a CodeTree of the table, Tree.node(char) is the
+            integer-coded elements of 'char'
+Lengths     dict mapping characters to their number of elements
+
+A morse code is packed into an int: a leading 1 bit (the length prefix)
+followed by one bit per element, 0 for a dot and 1 for a dash.  So 'A'
+(.-) is 0b101 and 'N' (-.) is 0b110.  These are the node numbers of a
+binary tree with the empty code at the root (1), so appending an element
+is just 'node*2 + bit' and the decoder never builds a string.
+
+tree = CodeTree(table)
+----------------------
+Build the lookup from a dict mapping morse strings ('.-') to characters.
+
+node = CodeTree.Root
+node = tree.step(node, dash)
+----------------------------
+Add a dot (dash False) or dash (dash True) to 'node'.
+
+tree.possible(node)
+-------------------
+True if 'node' is a code or the start of a code in the table.  Once
+False no more elements can give a known character.
+
+char = tree.char(node)
+----------------------
+The character for 'node', or None.
+
+char = tree.decode(node)
+------------------------
+The character for 'node', or u'\u00bf<code>' if it's unknown.
+
+code = tree.code(node)
+----------------------
+The morse string ('.-') for 'node'.
+
+node = tree.node(char)
+----------------------
+The node for character 'char', raises KeyError if unknown.
+
+dashes = tree.elements(char)
+----------------------------
+A tuple of the elements of 'char', True for dash, False for dot.
+"""
+
+
+def encode(code):
+    """Return the node number of a morse string like '.-'."""
+
+    node = CodeTree.Root
+    for s in code:
+        node = node*2 + (s == '-')
+    return node
+
+
+class CodeTree:
+    """A morse lookup table indexed by integer-coded element sequences."""
+
+    Root = 1            # the empty code
+
+    def __init__(self, table):
+        """Build the lookup.
+
+        table  dict mapping morse strings ('.-') to characters
+        """
+
+        depth = max(len(code) for code in table)
+        self.size = 2 << depth
+
+        self.chars = [None] * self.size          # node -> character
+        self.prefixes = bytearray(self.size)     # 1 if node starts a code
+        self.nodes = {}                          # character -> node
+        self.dashes = {}                         # character -> elements
+
+        for (code, char) in table.items():
+            node = encode(code)
+            if self.chars[node] is not None:
+                raise Exception("Morse code '%s' is used for '%s' and '%s'"
+                                % (code, self.chars[node], char))
+            self.chars[node] = char
+            self.nodes[char] = node
+            self.dashes[char] = tuple(s == '-' for s in code)
+            while node:
+                self.prefixes[node] = 1
+                node >>= 1
+
+    @staticmethod
+    def step(node, dash):
+        """Return 'node' with a dot (dash False) or dash appended."""
+
+        return node*2 + dash
+
+    def possible(self, node):
+        """True if 'node' is a known code or a prefix of one."""
+
+        return node < self.size and self.prefixes[node] == 1
+
+    def char(self, node):
+        """Return the character for 'node', or None if unknown."""
+
+        if node < self.size:
+            return self.chars[node]
+        return None
+
+    def decode(self, node):
+        """Return the character for 'node', or a marked up unknown code."""
+
+        char = self.char(node)
+        if char is None:
+            char = u'\u00bf' + '<%s>' % self.code(node)
+        return char
+
+    @staticmethod
+    def code(node):
+        """Return the morse string ('.-') for 'node'."""
+
+        return bin(node)[3:].replace('0', '.').replace('1', '-')
+
+    def node(self, char):
+        """Return the node for 'char', raises KeyError if unknown."""
+
+        return self.nodes[char]
+
+    def elements(self, char):
+        """Return the elements of 'char', True for a dash."""
+
+        return self.dashes[char]
+
+
+# the canonical table, characters to morse strings
+Codes = {
+         '!': '-.-.--', '"': '.-..-.', '$': '...-..-', '&': '.-...',
+         "'": '.----.', '(': '-.--.', ')': '-.--.-', ',': '--..--',
+         '-': '-....-', '.': '.-.-.-', '/': '-..-.', ':': '---...',
+         ';': '-.-.-.', '=': '-...-', '?': '..--..', '@': '.--.-.',
+         '_': '..--.-', '+': '.-.-.',
+
+         '0': '-----', '1': '.----', '2': '..---', '3': '...--',
+         '4': '....-', '5': '.....', '6': '-....', '7': '--...',
+         '8': '---..', '9': '----.',
+
+         'A': '.-', 'B': '-...', 'C': '-.-.', 'D': '-..',
+         'E': '.', 'F': '..-.', 'G': '--.', 'H': '....',
+         'I': '..', 'J': '.---', 'K': '-.-', 'L': '.-..',
+         'M': '--', 'N': '-.', 'O': '---', 'P': '.--.',
+         'Q': '--.-', 'R': '.-.', 'S': '...', 'T': '-',
+         'U': '..-', 'V': '...-', 'W': '.--', 'X': '-..-',
+         'Y': '-.--', 'Z': '--..'
+        }
+
+# the indexes derived from the table
+Chars = {code: char for (char, code) in Codes.items()}
+Tree = CodeTree(Chars)
+Lengths = {char: len(code) for (char, code) in Codes.items()}
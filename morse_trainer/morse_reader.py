@@ -19,7 +19,7 @@ from instructions import Instructions
 import utils
 
 import logger
-log = logger.Log('debug.log', logger.Log.DEBUG)
+log = logger.Log('debug.log', logger.Log.DEBUG, threaded=True)
 
 
 # set platform-dependent stuff, if any
@@ -93,11 +93,15 @@ class MorseReader(QThread):
 
     def run(self):
         self.running = True
+        reader = self.receive_morse
         while self.running:
-            char = self.receive_morse.read_morse()
-            log('found: %s' % char)
-            if len(char) == 1:
-                self.sig_obj.morse_char.emit(char)
+            data = reader.stream.read(reader.block)
+            for (kind, _, char) in reader.feed(data):
+                if kind == receive_morse.ReadMorse.Element:
+                    continue
+                log.debug('found: %s', char)
+                if len(char) == 1:
+                    self.sig_obj.morse_char.emit(char)
 
 class MorseTrainer(QTabWidget):
     def __init__(self, parent = None):
@@ -0,0 +1,132 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Read recorded audio for the morse reader from a file.
+
+The file is memory mapped and handed out in blocks, so decoding runs as
+fast as the decoder can go.  Both .WAV files and raw PCM files (16 bit
+signed little-endian samples) are handled.  Only the first channel of a
+multi-channel file is used.
+
+source = PCMFile(filename, rate=None, channels=1, start=0, end=None)
+--------------------------------------------------------------------
+'rate' and 'channels' are only used for raw PCM files, a .WAV file
+supplies its own.  'rate' defaults to PCMFile.DefaultRate for raw files.
+'start' and 'end' select a slice of the file (in samples).
+
+num = len(source)
+-----------------
+The number of samples in the (sliced) source.
+
+data = source.read(num_samples)
+-------------------------------
+Return a numpy int16 array of up to 'num_samples' samples.  An empty
+array means the end of the file.
+
+source.close()
+--------------
+"""
+
+import struct
+import numpy as np
+
+
+class PCMFile:
+    """A memory mapped source of 16 bit audio samples."""
+
+    # default sample rate of a raw PCM file
+    DefaultRate = 8000
+
+    # reads don't wait for real time
+    live = False
+
+    def __init__(self, filename, rate=None, channels=1, start=0, end=None):
+        """Open and memory map the file.
+
+        filename  path to the .WAV or raw PCM file
+        rate      sample rate of a raw PCM file
+        channels  number of interleaved channels in a raw PCM file
+        start     index of the first sample to use
+        end       index after the last sample to use (None means all)
+        """
+
+        self.filename = filename
+
+        with open(filename, 'rb') as fd:
+            header = fd.read(12)
+            if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+                (offset, length, rate, channels) = self._parse_wav(fd)
+            else:
+                offset = 0
+                fd.seek(0, 2)
+                length = fd.tell()
+                if rate is None:
+                    rate = PCMFile.DefaultRate
+
+        self.rate = rate
+        self.channels = channels
+
+        num_frames = length // (2 * channels)
+        if num_frames:
+            data = np.memmap(filename, dtype='<i2', mode='r', offset=offset,
+                             shape=(num_frames, channels))
+            self.samples = data[start:end, 0]
+        else:
+            self.samples = np.zeros(0, dtype=np.int16)
+        self.position = 0
+
+    def _parse_wav(self, fd):
+        """Find the format and sample data in a .WAV file.
+
+        fd  the open file, positioned after the RIFF header
+
+        Returns (data_offset, data_length, rate, channels).
+        """
+
+        rate = None
+        channels = None
+
+        while True:
+            chunk = fd.read(8)
+            if len(chunk) < 8:
+                raise Exception("No 'data' chunk in WAV file %s"
+                                % self.filename)
+            (chunk_id, chunk_size) = struct.unpack('<4sI', chunk)
+
+            if chunk_id == b'fmt ':
+                fmt = fd.read(chunk_size)
+                (format_tag, channels, rate, _, _,
+                 bits) = struct.unpack('<HHIIHH', fmt[:16])
+                if format_tag != 1 or bits != 16:
+                    raise Exception('WAV file %s is not 16 bit PCM'
+                                    % self.filename)
+                fd.seek(chunk_size % 2, 1)
+            elif chunk_id == b'data':
+                if rate is None:
+                    raise Exception("No 'fmt ' chunk in WAV file %s"
+                                    % self.filename)
+                offset = fd.tell()
+                fd.seek(0, 2)
+                length = min(chunk_size, fd.tell() - offset)
+                return (offset, length, rate, channels)
+            else:
+                fd.seek(chunk_size + chunk_size % 2, 1)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def read(self, num_samples, exception_on_overflow=False):
+        """Return the next 'num_samples' (or fewer) samples.
+
+        'exception_on_overflow' is accepted for PyAudio compatibility.
+        """
+
+        data = self.samples[self.position:self.position+num_samples]
+        self.position += len(data)
+        return data
+
+    def close(self):
+        """Release the memory map."""
+
+        self.samples = np.zeros(0, dtype=np.int16)
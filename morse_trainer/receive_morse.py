@@ -7,8 +7,30 @@ the English characters.  The code can read dynamic parameters from
 a JSON file.  The dynamic parameters (possibly changed) can be save
 back to a file.
 
-morse = ReadMorse()
-----------------
+morse = ReadMorse(detector=None)
+--------------------------------
+'detector' is the detection front-end, an object with a .process(samples)
+method returning envelope values.  If None an envelope.Envelope is used.
+Use a goertzel.Goertzel object to listen only to the sidetone frequency,
+or a tracker.ToneTracker to find the sidetone and follow it.
+
+morse = ReadMorse(source=pcm_file.PCMFile(filename))
+----------------------------------------------------
+Decode from an audio source (see the 'audio' module) instead of the
+microphone, eg, a recording or an audio.Loopback.  When a source that
+isn't live runs dry read_morse() raises EOFError.
+
+morse = ReadMorse(beam=True)
+----------------------------
+read_morse() returns characters from a viterbi.BeamDecoder, which
+tolerates badly timed sending better but returns each character a few
+elements later.  Spaces are only returned between words.
+
+morse = ReadMorse(trace=token_trace.TokenTrace())
+-------------------------------------------------
+Record every (count, level) token and the decoder state in a binary
+trace, see the 'token_trace' module.  Write it out with
+morse.trace.dump(filename).
 
 morse.load_params(params_file)
 -----------------------
@@ -18,6 +40,51 @@ morse.save_params(params_file)
 
 char = morse.read_morse()
 ----------------------
+Read from the source until a character (or space) is decoded.
+
+for (kind, time, value) in morse.feed(samples):
+-----------------------------------------------
+Decode a block of int16 samples (numpy array or bytes) of any size and
+return a list of the events found.  The decoder state is kept between
+calls, all the samples are decoded before the list is returned.
+'time' is in seconds from the start of decoding and the events are:
+    (ReadMorse.Element, time, (symbol, duration))
+                                a '.' or '-' started at 'time' and lasted
+                                'duration' seconds
+    (ReadMorse.Char, time, char)
+                                a character was decoded
+    (ReadMorse.Unknown, time, code)
+                                the elements aren't a known character,
+                                'code' is the marked up elements, eg,
+                                u'\u00bf<......>'.  A character is cut off
+                                as soon as no known code starts with its
+                                elements, the rest of it is ignored
+    (ReadMorse.CharGap, time, ' ')
+                                the gap after a character
+    (ReadMorse.WordGap, time, ' ')
+                                the gap after a word
+
+for (kind, time, value) in morse.feed_token(time, token):
+---------------------------------------------------------
+Decode one recorded (count, level) token that ended at 'time' seconds,
+eg, from a token trace, and return a list of the events found.  The
+detector and the threshold aren't used.
+
+for event in morse.finish():
+----------------------------
+Add enough silence to finish the last word, return a list of events.
+
+morse.snr
+---------
+The signal to noise ratio (dB) of the input, from the running noise
+floor and signal peak (see the 'levels' module).
+
+morse.overflows, morse.overruns
+-------------------------------
+Capture data lost by the microphone source (see audio.CallbackInput):
+samples dropped because the ring buffer was full, and PortAudio input
+overflow reports.  Counted over all the sources used, always 0 for
+sources that don't capture.
 
 morse.close()
 -------------
@@ -30,12 +97,6 @@ import_errors = False
 import sys
 import json
 
-try:
-    import pyaudio
-except ImportError:
-    print("Can't import 'pyaudio'")
-    import_errors = True
-
 try:
     import numpy as np
 except ImportError:
@@ -45,13 +106,28 @@ except ImportError:
 if import_errors:
     sys.exit(10)
 
+import collections
+
+import audio
+import envelope
+import goertzel
+import levels
+import morse_code
+import timing
+import token_trace
+import tracker
+import viterbi
+import pcm_file
+
 
 class ReadMorse:
 
     CHUNK = 16
-    FORMAT = pyaudio.paInt16
-    CHANNELS = 1
     RATE = 8000
+    BLOCK = CHUNK * 64          # samples read from the stream at one time
+    FileBlock = CHUNK * 4096    # samples read from a file source at one time
+    CaptureChunk = CHUNK * 16   # samples per microphone capture callback
+    CaptureSize = RATE * 8      # samples held in the capture ring buffer
 
     # lengths of various things (set for my slow speed!)
     LenDot = 30
@@ -62,34 +138,40 @@ class ReadMorse:
     MinSignal = 500
     SignalThreshold = 10000
 
+    # envelope detection: 'abs' or 'rms', and the SOUND/SILENCE hysteresis
+    EnvelopeMode = 'abs'
+    Silence = 20        # no SOUND for this many chunks is SILENCE
+    Hold = 2            # hang time (in chunks) before silence is noticed
+
     # lower sampling rate counters
     CharSpace = 3      # number of silences indicates a space
     WordSpace = 9      # number of silences to end word
 
-    # dict to translate morse code strings to characters
-    Morse = {
-             '.-':      'A', '-...':    'B', '-.-.':    'C', '-..':     'D',
-             '.':       'E', '..-.':    'F', '--.':     'G', '....':    'H',
-             '..':      'I', '.---':    'J', '-.-':     'K', '.-..':    'L',
-             '--':      'M', '-.':      'N', '---':     'O', '.--.':    'P',
-             '--.-':    'Q', '.-.':     'R', '...':     'S', '-':       'T',
-             '..-':     'U', '...-':    'V', '.--':     'W', '-..-':    'X',
-             '-.--':    'Y', '--..':    'Z',
+    # number of recent marks and gaps the timing clusters are taken from
+    MarkWindow = 8
+    GapWindow = 16
 
-             '.----':   '1', '..---':   '2', '...--':   '3', '....-':   '4',
-             '.....':   '5', '-....':   '6', '--...':   '7', '---..':   '8',
-             '----.':   '9', '-----':   '0',
+    # kinds of event generated by feed()
+    Element = 'element'     # value is (symbol, duration)
+    Char = 'char'           # value is the character
+    Unknown = 'unknown'     # value is the marked up unknown code
+    CharGap = 'chargap'     # value is ' '
+    WordGap = 'wordgap'     # value is ' '
 
-             '.-.-.-':  '.', '--..--':  ',', '..--..':  '?', '.----.':  '\'',
-             '-.-.--':  '!', '-..-.':   '/', '-.--.':   '(', '-.--.-':  ')',
-             '.-...':   '&', '---...':  ':', '-.-.-.':  ';', '-...-':   '=',
-             '-....-':  '-', '..--.-':  '_', '.-..-.':  '"', '...-..-': '$',
-             '.--.-.':  '@',
-            }
+    # translate morse code strings to characters, and the integer-coded
+    # table for decoding one element at a time
+    Morse = morse_code.Chars
+    Tree = morse_code.Tree
 
 
-    def __init__(self):
-        """Prepare the ReceiveMorse object."""
+    def __init__(self, detector=None, source=None, beam=False, trace=None):
+        """Prepare the ReceiveMorse object.
+
+        detector  the detection front-end object (None means broadband)
+        source    audio source object (None means the microphone)
+        beam      True if read_morse() uses the beam search decoder
+        trace     a token_trace.TokenTrace to record the tokens in
+        """
 
         # set receive params to defaults
         self.len_dot = ReadMorse.LenDot
@@ -104,17 +186,82 @@ class ReadMorse:
         self.sent_space = True
         self.sent_word_space = True
 
-        self.pyaudio = pyaudio.PyAudio()
-        self.stream = self.pyaudio.open(format=ReadMorse.FORMAT,
-                                        channels=ReadMorse.CHANNELS,
-                                        rate=ReadMorse.RATE,
-                                        input=True,
-                                        frames_per_buffer=ReadMorse.CHUNK)
+        # decoder state, kept between calls to feed()
+        self.space_count = 0
+        self.word_count = 0
+        self.morse = morse_code.CodeTree.Root   # elements of the character
+        self.chars = collections.deque()    # chars read_morse() hasn't used
+
+        # timing clusters of marks (dot, dash) and gaps (element, char, word)
+        self.marks = timing.Clusters(timing.Clusters.MarkRatios,
+                                     ReadMorse.MarkWindow)
+        self.gaps = timing.Clusters(timing.Clusters.GapRatios,
+                                    ReadMorse.GapWindow)
+        self.sound_end = None       # position the last mark ended
+
+        # the audio source, the microphone by default
+        if source is None:
+            source = audio.CallbackInput(rate=ReadMorse.RATE,
+                                         chunk=ReadMorse.CaptureChunk,
+                                         size=ReadMorse.CaptureSize)
+        self.rate = source.rate
+        self.block = ReadMorse.BLOCK if source.live else ReadMorse.FileBlock
+        self.stream = source
+        self.at_eof = False
+        self.old_overflows = 0      # lost capture data of closed sources
+        self.old_overruns = 0
+
+        # the detection front-end and the SOUND/SILENCE state machine
+        if detector is None:
+            detector = envelope.Envelope(chunk=ReadMorse.chunk_size(self.rate),
+                                         mode=ReadMorse.EnvelopeMode)
+        self.detector = detector
+        self.hysteresis = envelope.Hysteresis(silence=ReadMorse.Silence,
+                                              hold=ReadMorse.Hold)
+
+        # seconds per envelope value, for event times
+        self.value_time = ReadMorse.chunk_size(self.rate) / self.rate
+
+        # running noise floor and signal peak, setting the threshold
+        self.levels = levels.LevelEstimator(self.value_time,
+                                            noise=self.min_signal,
+                                            peak=self.max_signal)
+        self.snr = self.levels.snr
+
+        # the optional beam search decoder used by read_morse()
+        self.beam = viterbi.BeamDecoder(self) if beam else None
+
+        self.trace = trace
+
+    @staticmethod
+    def chunk_size(rate):
+        """Return samples per envelope value at sample rate 'rate'.
+
+        Keeps each envelope value the same length in time as CHUNK
+        samples at RATE, so the timing parameters are unchanged.
+        """
+
+        return max(1, round(ReadMorse.CHUNK * rate / ReadMorse.RATE))
+
+    @property
+    def overflows(self):
+        """Capture samples dropped because the ring buffer was full."""
+
+        return self.old_overflows + getattr(self.stream, 'overflows', 0)
+
+    @property
+    def overruns(self):
+        """PortAudio input overflow reports."""
+
+        return self.old_overruns + getattr(self.stream, 'overruns', 0)
 
     def close(self):
-        self.stream.stop_stream()
-        self.stream.close()
-        self.pyaudio.terminate()
+        if self.stream is not None:
+            # keep the counts of lost capture data
+            self.old_overflows = self.overflows
+            self.old_overruns = self.overruns
+            self.stream.close()
+            self.stream = None
 
     def __del__(self):
         self.close()
@@ -165,127 +312,220 @@ class ReadMorse:
         except KeyError:
             raise Exception('Invalid data in JSON file %s' % filename)
 
-    def _decode_morse(self, morse):
-        """Decode morse code and send character to output.
+        self.levels.reset(self.min_signal, self.max_signal)
+
+    def _reset_char(self):
+        """Start looking for a new character."""
+
+        self.space_count = 0
+        self.word_count = 0
+        self.morse = morse_code.CodeTree.Root
+
+    def _adapt_timing(self, count):
+        """Update the timing clusters with a mark of 'count' values.
 
-        Also return the decode character.
+        The gap before the mark is added too, unless it was a long pause.
+        The dot/dash threshold and the space counts are then set from
+        the cluster centres.
         """
 
-        try:
-            char = ReadMorse.Morse[morse]
-        except KeyError:
-            char = u'\u00bf' + '<%s>' % morse
-        return char
+        self.marks.add(count, self.len_dot)
+        (len_dot, len_dash) = self.marks.centres(self.len_dot)
+        self.len_dot = int(round(len_dot))
+        self.len_dash = int(round(len_dash))
+        self.dot_dash_threshold = (self.len_dot + self.len_dash) // 2
+
+        # gaps are clustered in dots, so a change of speed is followed
+        # as soon as the marks follow it
+        if self.sound_end is not None:
+            gap = (self.hysteresis.sound_start - self.sound_end) / len_dot
+            pause = 2 * max(self.gaps.centres(1)[-1],
+                            timing.Clusters.GapRatios[-1])
+            if gap <= pause:
+                self.gaps.add(gap, 1)
+        self.sound_end = self.hysteresis.position - self.hysteresis.hold
+
+        # silences are counted in units of 'Silence' values after the
+        # 'Hold', the word count restarts when the character is emitted
+        (char_gap, word_gap) = self.gaps.thresholds(1) * len_dot
+        silence = self.hysteresis.silence
+        hold = self.hysteresis.hold
+        self.char_space = max(1, int(np.ceil((char_gap - hold) / silence)))
+        word_space = int(np.ceil((word_gap - hold) / silence))
+        self.word_space = max(1, word_space - self.char_space)
+
+    def _adapt_levels(self, values):
+        """Update the noise floor, peak and threshold from a block."""
+
+        self.levels.update(values)
+        self.min_signal = int(self.levels.noise)
+        self.max_signal = int(self.levels.peak)
+        self.signal_threshold = self.levels.threshold
+        self.snr = self.levels.snr
+
+    def _events(self):
+        """Generate events for the tokens the buffered values make."""
 
-    def _get_sample(self, stream):
-        """Return a sample number that indicates sound or silence.
+        while True:
+            token = self.hysteresis.next(self.signal_threshold)
+            if token is None:
+                return
+            yield from self._decode_token(token)
 
-        Returned values are:
-            -N  silence for N samples
-            N   N samples of sound (terminated by silence)
+    def _decode_token(self, token):
+        """Generate the events from one (count, level) token.
+
+        The token counts are:
+            -N  silence for N envelope values
+            N   N envelope values of sound (terminated by silence)
         """
 
-        # state values
-        S_SOUND = 1
-        S_SILENCE = 2
+        (count, level) = token
+        now = self.hysteresis.position * self.value_time
+
+        if self.trace is not None:
+            self.trace.record(now, count, level, self.signal_threshold,
+                              self.len_dot, self.len_dash)
+
+        if count > 0:
+            # got a sound
+            if count < 3:
+                return      # not long enough, ignore
+
+            self.sent_word_space = False
+            self.sent_space = False
+            self.space_count = 0
+            self.word_count = 0
+
+            self._adapt_timing(count)
+
+            # dot or dash?
+            dash = count > self.dot_dash_threshold
+            yield (ReadMorse.Element,
+                   self.hysteresis.sound_start * self.value_time,
+                   ('-' if dash else '.', count * self.value_time))
+
+            if self.morse is None:
+                return      # rest of a character already cut off
+
+            self.morse = ReadMorse.Tree.step(self.morse, dash)
+            if not ReadMorse.Tree.possible(self.morse):
+                # no code starts with these elements, cut the character off
+                code = ReadMorse.Tree.decode(self.morse)
+                self.morse = None
+                yield (ReadMorse.Unknown, now, code)
+        else:
+            # got a silence, bump silence counters
+            self.space_count += 1
+            self.word_count += 1
+
+            # if silence long enough, emit a space
+            if self.space_count >= self.char_space:
+                if self.morse not in (None, morse_code.CodeTree.Root):
+                    char = ReadMorse.Tree.char(self.morse)
+                    kind = ReadMorse.Char
+                    if char is None:
+                        char = ReadMorse.Tree.decode(self.morse)
+                        kind = ReadMorse.Unknown
+                    self._reset_char()
+                    yield (kind, now, char)
+                    return
+                elif not self.sent_space:
+                    self.sent_space = True
+                    self._reset_char()
+                    yield (ReadMorse.CharGap, now, ' ')
+                    return
+                self.space_count = 0
+
+            if self.word_count >= self.word_space:
+                if not self.sent_word_space:
+                    self.sent_word_space = True
+                    self._reset_char()
+                    yield (ReadMorse.WordGap, now, ' ')
+                    return
+                self.word_count = 0
+
+    def feed(self, samples):
+        """Decode a block of samples, return a list of events.
+
+        samples  int16 samples as a numpy array or bytes
+        """
 
-        # count of silence or sound time
-        count = 0
+        values = self.detector.process(samples)
+        return list(self._feed_values(values))
 
-        # no SOUND for this time is SILENCE
-        SILENCE = 20
+    def _feed_values(self, values):
+        """Generate the events from envelope values, a sub-block at a time.
 
-        # hang time before silence is noticed
-        HOLD = 2
+        The levels are updated from each sub-block just before its tokens
+        are made.  A sub-block is no bigger than the level estimator window
+        so a big file block doesn't set the threshold from values seconds
+        past the ones being decoded.
+        """
 
-        state = S_SILENCE
-        hold = HOLD
+        step = self.levels.size
+        for start in range(0, len(values), step):
+            block = values[start:start+step]
+            self._adapt_levels(block)
+            self.hysteresis.push(block)
+            yield from self._events()
 
-        values = []
+    def feed_token(self, time, token):
+        """Decode one recorded token, return a list of events.
 
-        while True:
-            data = stream.read(ReadMorse.CHUNK, exception_on_overflow=False)
-            data = np.fromstring(data, 'int16')
-            data = [abs(x) for x in data]
-            value = int(sum(data) // len(data))      # average value
-            values.append(value)
-
-            if state == S_SILENCE:
-                # in SILENCE state
-                if value < self.signal_threshold:
-                    count += 1
-                    if count >= SILENCE:
-                        return (-count, sum(values) // len(values))
-                else:
-                    # we have a signal, change to SOUND state
-                    state = S_SOUND
-                    count = 0
-                    values = []     # start value samples fresh
-            else:
-                # in SOUND state
-                if value < self.signal_threshold:
-                    hold -= 1
-                    if hold <= 0:
-                        # silence at the end of a SOUND period
-                        # return SOUND result
-                        return (count, sum(values) // len(values))
-                else:
-                    hold = HOLD
-                    count += 1
+        time   seconds from the start of decoding when the token ended
+        token  a (count, level) token
+
+        A SOUND is taken to have started 'count' values (and the hold
+        time) before its end.
+        """
+
+        position = int(round(time / self.value_time))
+        if token[0] > 0:
+            self.hysteresis.sound_start = (position - self.hysteresis.hold
+                                           - token[0] - 1)
+        self.hysteresis.position = position
+        return list(self._decode_token(token))
+
+    def finish(self):
+        """Add silence to finish the last word, return a list of events."""
+
+        flush = ReadMorse.Silence * (self.word_space + 1)
+        self.hysteresis.push(np.zeros(flush, dtype=np.int64))
+        return list(self._events())
 
     def read_morse(self):
-        """Returns one character in morse."""
+        """Returns one character in morse.
 
-        space_count = 0
-        word_count = 0
-        morse = ''
+        Audio is read from the source in large blocks.  When a source that
+        isn't live runs dry the last word is finished, then EOFError is
+        raised.
+        """
 
         while True:
-            (count, level) = self._get_sample(self.stream)
-
-            if count > 0:
-                # got a sound
-                self.max_signal = level
-                if count < 3:
-                    continue    # not long enough, ignore
-
-                self.sent_word_space = False
-                self.sent_space = False
-                space_count = 0
-                word_count = 0
-
-                # dot or dash?
-                if count > self.dot_dash_threshold:
-                    morse += '-'
-                    self.len_dash = (self.len_dash*2 + count) // 3
-                else:
-                    morse += '.'
-                    self.len_dot = (self.len_dot*2 + count) // 3
-
-                self.dot_dash_threshold = (self.len_dot + self.len_dash) // 2
+            if self.chars:
+                return self.chars.popleft()
+
+            if self.at_eof:
+                raise EOFError
+
+            data = self.stream.read(self.block, exception_on_overflow=False)
+            if len(data) == 0:
+                self.at_eof = True
+                self._queue_chars(self.finish())
+                if self.beam:
+                    self.chars.extend(self.beam.finish())
             else:
-                # got a silence, bump silence counters & capture minimum
-                space_count += 1
-                word_count += 1
-                self.min_signal = level
-
-                # if silence long enough, emit a space
-                if space_count >= self.char_space:
-                    if morse:
-                        return self._decode_morse(morse)
-                    elif not self.sent_space:
-                        self.sent_space = True
-                        return ' '
-                    space_count = 0
-
-                if word_count >= self.word_space:
-                    if not self.sent_word_space:
-                        self.sent_word_space = True
-                        return ' '
-                    word_count = 0
-
-            # set new signal threshold
-            self.signal_threshold = (self.min_signal + 2*self.max_signal)//3
+                self._queue_chars(self.feed(data))
+
+    def _queue_chars(self, events):
+        """Queue the characters decoded from 'events' for read_morse()."""
+
+        for event in events:
+            if self.beam:
+                self.chars.extend(self.beam.push(event))
+            elif event[0] != ReadMorse.Element:
+                self.chars.append(event[2])
 
 
 if __name__ == '__main__':
@@ -309,39 +549,92 @@ if __name__ == '__main__':
         if msg:
             print(('*'*80 + '\n%s\n' + '*'*80) % msg)
         print("\n"
-              "CLI program to read morse from the microphone and\n"
-              "print the received characters.\n\n"
-              "Usage: morse [-f filename] [-h] [-l] [-s]\n\n"
-              "where -f filename  means read params from filename\n"
+              "CLI program to read morse from the microphone (or a\n"
+              "recording) and print the received characters.\n\n"
+              "Usage: morse [-b] [-d filename] [-f filename] [-g freq] [-h]\n"
+              "             [-i filename] [-l] [-r rate] [-s] [-t]\n\n"
+              "where -b           means use the beam search decoder\n"
+              "      -d filename  means write a token trace to filename\n"
+              "      -f filename  means read params from filename\n"
+              "      -g freq      means only listen to tone at 'freq' hertz\n"
               "      -h           means print this help and stop\n"
+              "      -i filename  means decode a .WAV or raw PCM file\n"
+              "      -r rate      means sample rate of a raw PCM file\n"
               "      -l           means don't load any params from file"
-              "      -s           means don't save any params to file")
+              "      -s           means don't save any params to file\n"
+              "      -t           means find and follow the sidetone")
 
 
     # parse the CLI params
     argv = sys.argv[1:]
 
     try:
-        (opts, args) = getopt.getopt(argv, 'f:hls',
-                                     ['file=', 'help', 'load', 'save'])
+        (opts, args) = getopt.getopt(argv, 'bd:f:g:hi:lr:st',
+                                     ['beam', 'dump=', 'file=', 'goertzel=',
+                                      'help', 'input=', 'load', 'rate=',
+                                      'save', 'track'])
     except getopt.GetoptError as err:
         usage(err)
         sys.exit(1)
 
     read_param = True
     save_param = True
+    beam = False
+    trace_file = None
+    frequency = None
+    input_file = None
+    rate = None
+    track = False
     for (opt, param) in opts:
-        if opt in ['-f', '--file']:
+        if opt in ['-b', '--beam']:
+            beam = True
+        elif opt in ['-d', '--dump']:
+            trace_file = param
+        elif opt in ['-f', '--file']:
             params_file = param
+        elif opt in ['-g', '--goertzel']:
+            try:
+                frequency = int(param)
+            except ValueError:
+                usage("-g option must be followed by a frequency, eg: -g 750")
+                sys.exit(1)
         elif opt in ['-h', '--help']:
             usage()
             sys.exit(0)
+        elif opt in ['-i', '--input']:
+            input_file = param
+        elif opt in ['-r', '--rate']:
+            try:
+                rate = int(param)
+            except ValueError:
+                usage("-r option must be followed by a rate, eg: -r 8000")
+                sys.exit(1)
         elif opt in ['-l', '--load']:
             read_param = False
         elif opt in ['-s', '--save']:
             save_param = False
-
-    morse = ReadMorse()
+        elif opt in ['-t', '--track']:
+            track = True
+
+    source = None
+    source_rate = ReadMorse.RATE
+    if input_file:
+        source = pcm_file.PCMFile(input_file, rate=rate)
+        source_rate = source.rate
+
+    detector = None
+    chunk = ReadMorse.chunk_size(source_rate)
+    if track:
+        detector = tracker.ToneTracker(rate=source_rate, chunk=chunk,
+                                       length=8*chunk,
+                                       frequency=frequency or 750)
+    elif frequency:
+        detector = goertzel.Goertzel(frequency=frequency, rate=source_rate,
+                                     chunk=chunk, length=8*chunk)
+
+    trace = token_trace.TokenTrace() if trace_file else None
+    morse = ReadMorse(detector=detector, source=source, beam=beam,
+                      trace=trace)
     if read_param:
         morse.load_params(params_file)
 
@@ -351,9 +644,15 @@ if __name__ == '__main__':
         try:
             char = morse.read_morse()
             emit(char)
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             emit('\nFinished\n')
             break
 
+    if morse.overflows or morse.overruns:
+        print('Capture lost %d samples (%d overflow reports)'
+              % (morse.overflows, morse.overruns))
+
     if save_param:
         morse.save_params(params_file)
+    if trace_file:
+        trace.dump(trace_file)
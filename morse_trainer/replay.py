@@ -0,0 +1,313 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Replay recorded sessions through the morse reader as fast as it goes.
+
+A session is either a recording (.wav, .pcm or .raw) or a token trace
+(.trc, see the 'token_trace' module).  A recording is decoded from the
+audio, a trace is fed token by token straight into the ReadMorse state
+machine.  Each session is decoded with a fresh ReadMorse, so the results
+don't depend on what was decoded before.
+
+The decoded text is compared with the reference text in a file of the
+same name with a '.txt' extension, if there is one.  Text is compared
+with the case and runs of spaces ignored.  The decoding speed is shown
+as tokens and characters per second.
+
+(text, tokens, seconds) = replay_file(filename, params_file=None,
+                                      beam=False, frequency=None,
+                                      track=False, rate=None)
+------------------------------------------------------------------
+Decode one session, return the text, the number of tokens decoded and
+the time the decoding took.
+
+(errors, length) = compare(text, reference)
+-------------------------------------------
+Return the number of character errors (substituted, missed or extra) in
+'text' and the length of 'reference'.
+
+lines = differences(text, reference)
+------------------------------------
+Return a list of lines showing where 'text' differs from 'reference'.
+"""
+
+import os
+import time
+import difflib
+
+import audio
+import goertzel
+import pcm_file
+import token_trace
+import tracker
+from receive_morse import ReadMorse
+
+
+# file extensions of recordings and of traces
+AudioExtensions = ('.wav', '.pcm', '.raw')
+TraceExtension = '.trc'
+
+# extension of a reference text file
+TextExtension = '.txt'
+
+
+def _decode_trace(morse, filename):
+    """Decode the tokens in a trace file with 'morse'.
+
+    Returns (chars, tokens).
+    """
+
+    (records, _) = token_trace.load(filename)
+
+    # decoding time restarts at the start of the trace
+    start = records['time'][0] if len(records) else 0.0
+    times = (records['time'] - start).tolist()
+    tokens = list(zip(records['count'].tolist(), records['level'].tolist()))
+
+    chars = []
+    for (when, token) in zip(times, tokens):
+        chars.extend(_chars(morse, morse.feed_token(when, token)))
+    chars.extend(_chars(morse, morse.finish()))
+    if morse.beam:
+        chars.extend(morse.beam.finish())
+    return (chars, len(tokens))
+
+def _chars(morse, events):
+    """Return the characters decoded from 'events'."""
+
+    chars = []
+    for event in events:
+        if morse.beam:
+            chars.extend(morse.beam.push(event))
+        elif event[0] != ReadMorse.Element:
+            chars.append(event[2])
+    return chars
+
+def replay_file(filename, params_file=None, beam=False, frequency=None,
+                track=False, rate=None):
+    """Decode one recorded session.
+
+    filename     path to the recording or token trace
+    params_file  recognition params file to start from
+    beam         True if the beam search decoder is used
+    frequency    if not None, the Goertzel detector frequency (recordings)
+    track        True if the sidetone is tracked (recordings)
+    rate         sample rate of a raw PCM file
+
+    Returns (text, tokens, seconds), the decoded text, the number of
+    tokens decoded and the time (seconds) the decoding took.
+    """
+
+    if filename.lower().endswith(TraceExtension):
+        morse = ReadMorse(source=audio.Loopback(rate=ReadMorse.RATE),
+                          beam=beam)
+        morse.load_params(params_file)
+
+        start = time.perf_counter()
+        (chars, tokens) = _decode_trace(morse, filename)
+        seconds = time.perf_counter() - start
+        morse.close()
+        return (''.join(chars), tokens, seconds)
+
+    source = pcm_file.PCMFile(filename, rate=rate)
+    chunk = ReadMorse.chunk_size(source.rate)
+    detector = None
+    if track:
+        detector = tracker.ToneTracker(rate=source.rate, chunk=chunk,
+                                       length=8*chunk,
+                                       frequency=frequency or 750)
+    elif frequency:
+        detector = goertzel.Goertzel(frequency=frequency, rate=source.rate,
+                                     chunk=chunk, length=8*chunk)
+
+    # the trace is only used to count the tokens
+    trace = token_trace.TokenTrace(size=1)
+    morse = ReadMorse(detector=detector, source=source, beam=beam,
+                      trace=trace)
+    morse.load_params(params_file)
+
+    chars = []
+    start = time.perf_counter()
+    try:
+        while True:
+            chars.append(morse.read_morse())
+    except EOFError:
+        pass
+    seconds = time.perf_counter() - start
+    morse.close()
+
+    return (''.join(chars), trace.total, seconds)
+
+def _normalise(text):
+    """Return 'text' upper case with single spaces between words."""
+
+    return ' '.join(text.upper().split())
+
+def compare(text, reference):
+    """Count the character errors in decoded text.
+
+    text       the decoded text
+    reference  the text that was sent
+
+    Returns (errors, length) where 'errors' is the number of characters
+    substituted, missed or extra in 'text' and 'length' the length of
+    the reference.
+    """
+
+    text = _normalise(text)
+    reference = _normalise(reference)
+
+    matcher = difflib.SequenceMatcher(None, reference, text, autojunk=False)
+    errors = 0
+    for (tag, i1, i2, j1, j2) in matcher.get_opcodes():
+        if tag != 'equal':
+            errors += max(i2 - i1, j2 - j1)
+    return (errors, len(reference))
+
+def differences(text, reference):
+    """Return lines showing where 'text' differs from 'reference'."""
+
+    text = _normalise(text)
+    reference = _normalise(reference)
+
+    matcher = difflib.SequenceMatcher(None, reference, text, autojunk=False)
+    lines = []
+    for (tag, i1, i2, j1, j2) in matcher.get_opcodes():
+        if tag != 'equal':
+            lines.append('%7s at %4d: %r -> %r'
+                         % (tag, i1, reference[i1:i2], text[j1:j2]))
+    return lines
+
+def find_sessions(paths):
+    """Return the sorted session files in 'paths' (files or directories)."""
+
+    extensions = AudioExtensions + (TraceExtension,)
+    sessions = []
+    for path in paths:
+        if os.path.isdir(path):
+            sessions.extend(os.path.join(path, name)
+                            for name in sorted(os.listdir(path))
+                            if os.path.splitext(name)[1].lower() in extensions)
+        else:
+            sessions.append(path)
+    return sessions
+
+
+if __name__ == '__main__':
+    import sys
+    import getopt
+
+    def usage(msg=None):
+        if msg:
+            print(('*'*80 + '\n%s\n' + '*'*80) % msg)
+        print("\n"
+              "CLI program to decode recorded sessions (recordings or token\n"
+              "traces) as fast as possible, compare the text with the\n"
+              "reference .txt files and show the decoding speed.\n\n"
+              "Usage: replay [-b] [-e percent] [-f filename] [-g freq] [-h]\n"
+              "              [-r rate] [-t] [-v] file_or_directory ...\n\n"
+              "where -b           means use the beam search decoder\n"
+              "      -e percent   means fail if any session has a higher\n"
+              "                   character error rate\n"
+              "      -f filename  means read params from filename\n"
+              "      -g freq      means only listen to tone at 'freq' hertz\n"
+              "      -h           means print this help and stop\n"
+              "      -r rate      means sample rate of raw PCM files\n"
+              "      -t           means find and follow the sidetone\n"
+              "      -v           means show the differences in the text")
+
+    # parse the CLI params
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'be:f:g:hr:tv',
+                                     ['beam', 'errors=', 'file=', 'goertzel=',
+                                      'help', 'rate=', 'track', 'verbose'])
+    except getopt.GetoptError as err:
+        usage(err)
+        sys.exit(1)
+
+    beam = False
+    max_errors = None
+    params_file = None
+    frequency = None
+    rate = None
+    track = False
+    verbose = False
+    try:
+        for (opt, param) in opts:
+            if opt in ['-b', '--beam']:
+                beam = True
+            elif opt in ['-e', '--errors']:
+                max_errors = float(param)
+            elif opt in ['-f', '--file']:
+                params_file = param
+            elif opt in ['-g', '--goertzel']:
+                frequency = int(param)
+            elif opt in ['-h', '--help']:
+                usage()
+                sys.exit(0)
+            elif opt in ['-r', '--rate']:
+                rate = int(param)
+            elif opt in ['-t', '--track']:
+                track = True
+            elif opt in ['-v', '--verbose']:
+                verbose = True
+    except ValueError:
+        usage("Option '%s' must be followed by a number" % opt)
+        sys.exit(1)
+
+    sessions = find_sessions(args)
+    if not sessions:
+        usage('You must give at least one recording or trace')
+        sys.exit(1)
+
+    print('%-24s %7s %6s %7s %10s %9s'
+          % ('session', 'tokens', 'chars', 'errors', 'tokens/s', 'chars/s'))
+
+    failed = False
+    (total_tokens, total_chars, total_seconds) = (0, 0, 0.0)
+    (total_errors, total_length) = (0, 0)
+    for filename in sessions:
+        (text, tokens, seconds) = replay_file(filename,
+                                              params_file=params_file,
+                                              beam=beam, frequency=frequency,
+                                              track=track, rate=rate)
+        seconds = max(seconds, 1e-9)
+        num_chars = len(text.replace(' ', ''))
+        total_tokens += tokens
+        total_chars += num_chars
+        total_seconds += seconds
+
+        errors = '-'
+        reference = os.path.splitext(filename)[0] + TextExtension
+        if os.path.exists(reference):
+            with open(reference) as fd:
+                reference = fd.read()
+            (num_errors, length) = compare(text, reference)
+            total_errors += num_errors
+            total_length += length
+            rate_errors = 100 * num_errors / max(length, 1)
+            errors = '%.1f%%' % rate_errors
+            if max_errors is not None and rate_errors > max_errors:
+                failed = True
+                errors += '!'
+
+        print('%-24s %7d %6d %7s %10.0f %9.0f'
+              % (os.path.basename(filename)[:24], tokens, num_chars, errors,
+                 tokens/seconds, num_chars/seconds))
+        if verbose and errors != '-':
+            for line in differences(text, reference):
+                print('    %s' % line)
+
+    total_seconds = max(total_seconds, 1e-9)
+    errors = '-'
+    if total_length:
+        errors = '%.1f%%' % (100 * total_errors / total_length)
+    print('%-24s %7d %6d %7s %10.0f %9.0f'
+          % ('total', total_tokens, total_chars, errors,
+             total_tokens/total_seconds, total_chars/total_seconds))
+
+    if failed:
+        sys.exit(2)
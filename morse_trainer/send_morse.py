@@ -5,8 +5,12 @@
 Class to make morse sounds from English characters.  We use a state
 machine to send well-formed morse code.
 
-morse = SendMorse()
--------------------
+morse = SendMorse(sink=None)
+----------------------------
+'sink' is where the sound goes (see the 'audio' module).  If None the
+sound goes to the speakers, opened when first needed.  Use an
+audio.WavOutput to write a file or an audio.Loopback to feed a ReadMorse
+object directly.
 
 morse.set_speeds(chars_per_minute, words_per_minute)
 ----------------------------------------------------
@@ -20,19 +24,45 @@ morse.set_volume(volume)
 morse.set_frequency(frequency)
 ------------------------------
 
+morse.set_keying(shape, rise_time)
+----------------------------------
+Set the keying envelope, 'shape' is one of SendMorse.Shapes and
+'rise_time' is the rise (and fall) time in seconds.
+
 morse.send_morse(string)
 ------------------------
 Send a string of characters.
 
+samples = morse.render(string)
+------------------------------
+Return the sound for a string as a numpy float32 array, no audio device
+is used.
+
+for frame in morse.render_frames(string, frame_size):
+-----------------------------------------------------
+Yield the sound for a string as numpy float32 arrays of 'frame_size'
+samples, the last padded with silence.  Memory use doesn't depend on the
+length of the string.
+
+morse.render_to_wav(string, filename)
+-------------------------------------
+Write the sound for a string to a .WAV file.
+
+sink = morse.open()
+-------------------
+Return the audio sink, opening the speakers if needed.
+
 morse.close()
 -------------
 
 """
 
 import sys
-import math
 import numpy as np
-import pyaudio
+
+import audio
+import synth
+import morse_code
 
 
 class SendMorse:
@@ -43,84 +73,68 @@ class SendMorse:
     DefaultWPM = 5              # word speed (words per minute)
     DefaultVolume = 0.7         # in range [0.0, 1.0]
     DefaultFrequency = 750      # hertz
+    DefaultShape = 'cosine'     # keying envelope shape
+    DefaultRiseTime = 0.005     # keying envelope rise/fall time (seconds)
+
+    # keying envelope shapes, None means hard keying (clicks!)
+    Shapes = synth.Synth.Shapes
 
     # internal settings
-    SampleRate = 44000          # samples per second
-    Format = pyaudio.paFloat32  # sample must be in range [0.0, 1.0]
+    SampleRate = 44000          # samples per second, float32 samples
 
     # Words/minute below which we use the Farnsworth timing method
     FarnsworthThreshold = 18
 
-    # dict to translate characters into morse code strings
-    Morse = {
-             '!': '-.-.--', '"': '.-..-.', '$': '...-..-', '&': '.-...',
-             "'": '.----.', '(': '-.--.', ')': '-.--.-', ',': '--..--',
-             '-': '-....-', '.': '.-.-.-', '/': '-..-.', ':': '---...',
-             ';': '-.-.-.', '=': '-...-', '?': '..--..', '@': '.--.-.',
-             '_': '..--.-', '+': '.-.-.',
-
-             '0': '-----', '1': '.----', '2': '..---', '3': '...--',
-             '4': '....-', '5': '.....', '6': '-....', '7': '--...',
-             '8': '---..', '9': '----.',
+    # number of different speed settings kept in the character cache
+    MaxCachedSettings = 8
 
-             'A': '.-', 'B': '-...', 'C': '-.-.', 'D': '-..',
-             'E': '.', 'F': '..-.', 'G': '--.', 'H': '....',
-             'I': '..', 'J': '.---', 'K': '-.-', 'L': '.-..',
-             'M': '--', 'N': '-.', 'O': '---', 'P': '.--.',
-             'Q': '--.-', 'R': '.-.', 'S': '...', 'T': '-',
-             'U': '..-', 'V': '...-', 'W': '.--', 'X': '-..-',
-             'Y': '-.--', 'Z': '--..'
-            }
+    # translate characters into morse code strings, and the integer-coded
+    # table
+    Morse = morse_code.Codes
+    Tree = morse_code.Tree
 
 
     def __init__(self, volume=DefaultVolume, frequency=DefaultFrequency,
-                       cwpm=DefaultCWPM, wpm=DefaultWPM):
-        """Prepare the SendMorse object."""
+                       cwpm=DefaultCWPM, wpm=DefaultWPM, sink=None):
+        """Prepare the SendMorse object.
+
+        sink  the audio sink object (None means the speakers)
+        """
 
         # set send params to defaults
         self.cwpm = cwpm            # the character word speed
         self.wpm = wpm              # the word speed
         self.volume = volume        # volume
         self.frequency = frequency  # audio frequency
-
-        # prepare variables for created sound bites
-        self.dot_sound = None
-        self.dash_sound = None
-        self.inter_element_silence = None
-        self.inter_char_silence = None
-        self.inter_word_silence = None
+        self.shape = SendMorse.DefaultShape         # keying envelope shape
+        self.rise_time = SendMorse.DefaultRiseTime  # keying rise/fall time
+
+        # prepare variables for element timings (seconds) and the synth
+        self.dot_time = None
+        self.dash_time = None
+        self.inter_elem_time = None
+        self.inter_char_time = None
+        self.inter_word_time = None
+        self.synth = None
+
+        # cache of character timelines, one dict of {char: timeline} for
+        # each (cwpm, wpm) setting
+        self.char_cache = {}
+        self.char_timelines = None
 
         # create sounds at default speeds
         self.create_sounds()
 
-        # prepare the audio device
-        self.pyaudio = pyaudio.PyAudio()
-        self.stream = self.pyaudio.open(format=SendMorse.Format,
-                                        channels=1,
-                                        rate=SendMorse.SampleRate,
-                                        output=True)
+        # the audio device, the speakers are opened on first send()
+        if sink is not None and sink.rate != SendMorse.SampleRate:
+            raise Exception('Sink rate must be %d, got %d'
+                            % (SendMorse.SampleRate, sink.rate))
+        self.stream = sink
 
     def close(self):
-        self.stream.stop_stream()
-        self.stream.close()
-        self.pyaudio.terminate()
-
-    def make_tone(self, duration, volume):
-        """Create a string full of sinewave data.
-
-        Code modified from:
-            http://milkandtang.com/blog/2013/02/16/making-noise-in-python/
-        """
-
-        def sine(frequency, duration, sample_rate):
-            length = int(duration * sample_rate)
-            factor = float(frequency) * (math.pi * 2) / sample_rate
-            return np.sin(np.arange(length) * factor)
-
-        chunks = []
-        chunks.append(sine(self.frequency, duration, SendMorse.SampleRate))
-        chunk = np.concatenate(chunks) * volume
-        return chunk.astype(np.float32).tostring()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
 
     def farnsworth_times(self, cwpm, wpm):
         """Calculate Farnsworth spacing.
@@ -170,11 +184,52 @@ class SendMorse:
             inter_char_time = 3 * dot_time_f
             inter_word_time = 7 * dot_time_f
 
-        self.dot_sound = self.make_tone(dot_time, volume=self.volume)
-        self.dash_sound = self.make_tone(dash_time, volume=self.volume)
-        self.inter_element_silence = self.make_tone(inter_elem_time, volume=0.0)
-        self.inter_char_silence = self.make_tone(inter_char_time, volume=0.0)
-        self.inter_word_silence = self.make_tone(inter_word_time, volume=0.0)
+        self.dot_time = dot_time
+        self.dash_time = dash_time
+        self.inter_elem_time = inter_elem_time
+        self.inter_char_time = inter_char_time
+        self.inter_word_time = inter_word_time
+
+        # the tone synthesizer for these settings
+        self.synth = synth.Synth(SendMorse.SampleRate, self.frequency,
+                                 self.volume, shape=self.shape,
+                                 rise_time=self.rise_time,
+                                 min_gap=inter_elem_time)
+
+        # select the character timelines for these speeds
+        key = (self.cwpm, self.wpm)
+        self.char_timelines = self.char_cache.pop(key, {})
+        self.char_cache[key] = self.char_timelines      # now most recent
+        while len(self.char_cache) > SendMorse.MaxCachedSettings:
+            del self.char_cache[next(iter(self.char_cache))]
+
+    def char_timeline(self, char):
+        """Return the timeline for one (uppercase) character.
+
+        The timeline is a list of (duration, keyed) tuples and includes
+        the gap after the character.  Timelines are built once per speed
+        setting and then kept in the cache.
+        """
+
+        try:
+            return self.char_timelines[char]
+        except KeyError:
+            pass
+
+        timeline = []
+        if char == ' ':
+            timeline.append((self.inter_word_time, False))
+        else:
+            for dash in SendMorse.Tree.elements(char):
+                if dash:
+                    timeline.append((self.dash_time, True))
+                else:
+                    timeline.append((self.dot_time, True))
+                timeline.append((self.inter_elem_time, False))
+        timeline.append((self.inter_word_time, False))
+
+        self.char_timelines[char] = timeline
+        return timeline
 
     def set_speeds(self, cwpm=None, wpm=None):
         """Set morse speeds."""
@@ -201,27 +256,100 @@ class SendMorse:
         self.frequency = frequency
         self.create_sounds()
 
-    def send(self, code):
-        """Send characters in 'code' to speakers as morse."""
+    def word_sounds(self, code):
+        """Generate the sound for 'code', one float32 array per word.
+
+        The words are rendered as one continuous transmission.
+        """
 
         # if, by some mischance we haven't created the sounds, do it now
-        if self.dot_sound is None:
+        if self.synth is None:
             self.create_sounds()
 
-       # send the morse
+        self.synth.reset()
+
+        word = []
         for char in code:
             char = char.upper()
-            if char == ' ':
-                self.stream.write(self.inter_word_silence)
-            elif char in SendMorse.Morse:
-                code = SendMorse.Morse[char]
-                for s in code:
-                    if s == '.':
-                        self.stream.write(self.dot_sound)
-                    elif s == '-':
-                        self.stream.write(self.dash_sound)
-                    self.stream.write(self.inter_element_silence)
-            else:
+            if char != ' ' and char not in SendMorse.Morse:
                 print("Unrecognized character '%s' in morse to send" % char)
+                word.append((self.inter_word_time, False))
+                continue
+
+            word.extend(self.char_timeline(char))
+            if char == ' ':
+                yield self.synth.render(word)
+                word = []
+
+        if word:
+            yield self.synth.render(word)
+        yield self.synth.flush()
+
+    def set_keying(self, shape=DefaultShape, rise_time=DefaultRiseTime):
+        """Set the keying envelope shape and rise/fall time."""
+
+        if shape not in SendMorse.Shapes:
+            raise Exception("Keying shape must be one of %s, got '%s'"
+                            % (str(SendMorse.Shapes), shape))
+
+        self.shape = shape
+        self.rise_time = rise_time
+        self.create_sounds()
+
+    def open(self):
+        """Return the audio sink, opening the speakers if there is none."""
+
+        if self.stream is None:
+            self.stream = audio.PyAudioOutput(rate=SendMorse.SampleRate)
+        return self.stream
+
+    def send(self, code):
+        """Send characters in 'code' to speakers as morse."""
+
+        stream = self.open()
+
+        # send the morse, one contiguous buffer per word
+        for sound in self.word_sounds(code):
+            stream.write(sound)
+
+    def render(self, code):
+        """Return the sound of 'code' as a numpy float32 array."""
+
+        return np.concatenate(list(self.word_sounds(code)))
+
+    def render_frames(self, code, frame_size=4096):
+        """Generate the sound of 'code' in frames of 'frame_size' samples.
+
+        Each frame is a numpy float32 array.  The last frame is padded
+        with silence.
+        """
 
-            self.stream.write(self.inter_word_silence)
+        pending = []        # sample arrays not yet made into a frame
+        num_pending = 0
+        for sound in self.word_sounds(code):
+            pending.append(sound)
+            num_pending += len(sound)
+            if num_pending < frame_size:
+                continue
+
+            samples = np.concatenate(pending)
+            num_frames = len(samples) // frame_size
+            for i in range(num_frames):
+                yield samples[i*frame_size:(i+1)*frame_size]
+            pending = [samples[num_frames*frame_size:]]
+            num_pending = len(pending[0])
+
+        if num_pending:
+            frame = np.zeros(frame_size, dtype=np.float32)
+            frame[:num_pending] = np.concatenate(pending)
+            yield frame
+
+    def render_to_wav(self, code, filename):
+        """Write the sound of 'code' to a 16 bit mono .WAV file."""
+
+        wav = audio.WavOutput(filename, rate=SendMorse.SampleRate)
+        try:
+            for frame in self.render_frames(code):
+                wav.write(frame)
+        finally:
+            wav.close()
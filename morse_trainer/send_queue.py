@@ -0,0 +1,170 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Background, cancellable playback of morse for SendMorse.
+
+Text is rendered to sound in one thread and played in another, so the
+caller never waits and the next group is rendered while the current one
+plays.  The queue of rendered sound is bounded.  Each job is rendered
+with a copy of the sender taken when it was queued, so the caller may
+change the speeds, volume or frequency at any time and only later jobs
+are changed.
+
+queue = SendQueue(sender, max_buffers=8)
+----------------------------------------
+'sender' is the SendMorse object to render and play with.
+
+job = queue.enqueue(text, callback=None)
+----------------------------------------
+Queue 'text' to be sent.  Returns a job number.  When the text has been
+played 'callback(job)' is called from the playback thread.  A Qt
+signal's .emit is a suitable callback.
+
+queue.cancel()
+--------------
+Stop playing now and throw away everything queued.  Callbacks for the
+discarded jobs are not called.
+
+queue.flush(timeout=None)
+-------------------------
+Wait until everything queued has been played.  Returns False on timeout.
+
+queue.close()
+-------------
+"""
+
+import copy
+import queue
+import threading
+
+
+class SendQueue:
+    """Render and play morse in background threads."""
+
+    # number of samples written to the sink at one time, this sets how
+    # quickly cancel() takes effect
+    WriteSize = 2048
+
+    # marks the end of the threads
+    Stop = None
+
+    def __init__(self, sender, max_buffers=8):
+        """Start the render and playback threads.
+
+        sender       the SendMorse object
+        max_buffers  number of rendered words that may wait to be played
+        """
+
+        self.sender = sender
+        self.texts = queue.Queue()
+        self.buffers = queue.Queue(maxsize=max_buffers)
+
+        self.generation = 0         # bumped by cancel(), older work is stale
+        self.jobs = {}              # live job number -> callback
+        self.next_job = 0
+        self.lock = threading.Condition()
+
+        self.render_thread = threading.Thread(target=self._render,
+                                              daemon=True)
+        self.play_thread = threading.Thread(target=self._play, daemon=True)
+        self.render_thread.start()
+        self.play_thread.start()
+
+    def enqueue(self, text, callback=None):
+        """Queue text to be sent, return the job number."""
+
+        sender = self._snapshot()
+        with self.lock:
+            job = self.next_job
+            self.next_job += 1
+            self.jobs[job] = callback
+            self.texts.put((self.generation, job, sender, text))
+        return job
+
+    def _snapshot(self):
+        """Return a copy of the sender with its own synth, for one job.
+
+        The sender's settings are replaced, not changed in place, so the
+        copy isn't changed by later settings.  The synth has rendering
+        state so each copy needs its own.
+        """
+
+        sender = copy.copy(self.sender)
+        sender.synth = copy.copy(self.sender.synth)
+        return sender
+
+    def cancel(self):
+        """Stop playing and discard all queued work."""
+
+        with self.lock:
+            self.generation += 1
+            self.jobs.clear()
+            self.lock.notify_all()
+        for q in (self.texts, self.buffers):
+            try:
+                while True:
+                    q.get_nowait()
+            except queue.Empty:
+                pass
+
+    def flush(self, timeout=None):
+        """Wait until all queued text has been played.
+
+        Returns False if 'timeout' (seconds) expired first.
+        """
+
+        with self.lock:
+            return self.lock.wait_for(lambda: not self.jobs, timeout)
+
+    def close(self):
+        """Cancel everything and stop the threads."""
+
+        self.cancel()
+        self.texts.put(SendQueue.Stop)
+        self.render_thread.join()
+        self.play_thread.join()
+
+    def _render(self):
+        """Render thread, turn queued text into sound."""
+
+        while True:
+            item = self.texts.get()
+            if item is SendQueue.Stop:
+                self.buffers.put(SendQueue.Stop)
+                return
+
+            (generation, job, sender, text) = item
+            for sound in sender.word_sounds(text):
+                if generation != self.generation:
+                    break
+                self.buffers.put((generation, job, sound))
+            else:
+                # an empty sound marks the end of the job
+                self.buffers.put((generation, job, None))
+
+    def _play(self):
+        """Playback thread, write rendered sound to the sink."""
+
+        while True:
+            item = self.buffers.get()
+            if item is SendQueue.Stop:
+                return
+
+            (generation, job, sound) = item
+            if generation != self.generation:
+                continue
+
+            if sound is None:
+                with self.lock:
+                    callback = self.jobs.pop(job, None)
+                    self.lock.notify_all()
+                if callback:
+                    callback(job)
+                continue
+
+            stream = self.sender.open()
+            for start in range(0, len(sound), SendQueue.WriteSize):
+                if generation != self.generation:
+                    break
+                stream.write(sound[start:start+SendQueue.WriteSize])
@@ -0,0 +1,408 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Decode every morse signal in one audio stream at once, a 'skimmer'.
+
+The input is cut into overlapping frames, windowed and transformed with
+one numpy rfft call per block (a short-time Fourier transform), so each
+FFT bin is a narrow band-pass filter and its magnitude an envelope of
+the tone in that band.  A bin is an active carrier while its peak level
+is well above its noise floor and it is the strongest bin around (a
+tone spills into its neighbours).
+
+Each bin has its own decoder, but the state of all the decoders is kept
+in numpy arrays indexed by bin (levels, key state, edge times, dot and
+dash lengths, tree node), not in per-channel objects.  Key up/down for
+all bins in a block is found with a few array operations, and Python
+only runs for the key transitions of active bins.  So hundreds of
+channels cost little more than a few.
+
+The dot and dash lengths of each channel are tracked separately, so the
+channels may be sent at different speeds.
+
+skim = Skimmer(rate=8000, size=None, low=200, high=3000)
+--------------------------------------------------------
+'size' is the STFT frame size (None picks one about 16ms long).  A
+bigger frame separates closer signals but smears marks shorter than the
+frame, so it limits the speed.  Only bins from 'low' to 'high' hertz are
+decoded.
+
+found = skim.process(samples)
+-----------------------------
+Decode a block of int16 samples of any size.  Returns a list of
+(frequency, text) tuples of the text decoded in this block.  An unknown
+code is marked up as by ReadMorse, eg u'\u00bf<......>'.
+
+found = skim.finish()
+---------------------
+Decode any characters still pending at the end of the input.
+
+channels = skim.channels()
+--------------------------
+Return a dict mapping frequency (hertz) to all the text decoded there.
+"""
+
+import numpy as np
+
+import audio
+import morse_code
+
+
+class Skimmer:
+    """Decode morse on many frequencies from one audio stream."""
+
+    # length of an STFT frame and hop between frames (seconds)
+    FrameTime = 0.016
+    HopTime = 0.002
+
+    # per second, the peak level decays and the noise floor rises by
+    PeakDecay = 0.5
+    FloorRise = 2.0
+
+    # percentiles of the recent frames taken as the noise floor and peak
+    # level, the seconds of frames kept and the most frames between
+    # updates of the levels
+    FloorPercentile = 20
+    PeakPercentile = 95
+    LevelWindow = 2.0
+    LevelUpdate = 32
+
+    # an active carrier has a peak this many times its noise floor ...
+    MinRatio = 10.0
+
+    # ... is the biggest bin within 'Spread' bins, is not less than 'Mask'
+    # of the biggest bin within 'Guard' bins (window sidelobes) and not
+    # less than 'Range' of the biggest bin of all (key clicks)
+    Spread = 2
+    Guard = 8
+    Mask = 0.01
+    Range = 0.03
+
+    # an active carrier is dropped when a neighbour gets this much bigger
+    Hold = 2.0
+
+    # rate the timing adapts at
+    Adapt = 0.25
+
+    def __init__(self, rate=8000, size=None, low=200, high=3000):
+        """Prepare the skimmer.
+
+        rate  sample rate of the input
+        size  STFT frame size in samples, a power of two is fastest
+        low   lowest frequency decoded (hertz)
+        high  highest frequency decoded (hertz)
+        """
+
+        self.rate = rate
+        if size is None:
+            size = 1 << int(np.log2(rate * Skimmer.FrameTime))
+        self.size = size
+        self.hop = max(1, round(rate * Skimmer.HopTime))
+        self.frame_time = self.hop / rate
+
+        # a mark shorter than half a frame is noise
+        self.min_mark = max(1, size // self.hop // 2)
+
+        freqs = np.fft.rfftfreq(size, 1/rate)
+        self.bins = np.flatnonzero((freqs >= low) & (freqs <= high))
+        self.frequencies = freqs[self.bins].tolist()
+        self.window = np.hanning(size)
+
+        num = len(self.bins)
+        self.residue = np.zeros(0, dtype=np.float64)
+        self.frame = 0                  # index of the next frame
+
+        # per bin level state, from a ring of the recent frames
+        window = max(1, round(Skimmer.LevelWindow / self.frame_time))
+        self.history = np.zeros((window, num))
+        self.count = 0                  # frames ever added to the ring
+        self.since = 0                  # frames since the levels were set
+        self.peak = np.zeros(num)
+        self.floor = np.zeros(num)
+        self.active = np.zeros(num, dtype=bool)
+
+        # per bin decoder state, times are frame indices
+        self.keyed = np.zeros(num, dtype=bool)
+        self.edge = np.zeros(num, dtype=np.int64)   # last key down, or -1
+        self.fall = np.zeros(num, dtype=np.int64)   # end of the last mark
+        self.node = np.full(num, morse_code.CodeTree.Root, dtype=np.int64)
+        self.spaced = np.ones(num, dtype=bool)      # word gap already done
+        self.dot = np.zeros(num)                    # 0 means no marks yet
+        self.dash = np.zeros(num)
+
+        self.texts = [[] for _ in range(num)]
+
+    def _frames(self, samples):
+        """Return the magnitudes of the STFT of 'samples', frame by bin."""
+
+        data = np.concatenate((self.residue, np.asarray(samples,
+                                                        dtype=np.float64)))
+        num = max(0, (len(data) - self.size) // self.hop + 1)
+        self.residue = data[num*self.hop:]
+        if not num:
+            return np.zeros((0, len(self.bins)))
+
+        frames = np.lib.stride_tricks.sliding_window_view(data, self.size)
+        frames = frames[:(num-1)*self.hop+1:self.hop] * self.window
+        return np.abs(np.fft.rfft(frames, axis=1)[:, self.bins])
+
+    def _levels(self, mags):
+        """Update the per bin peak and noise floor, find the carriers.
+
+        The levels are taken from the last 'LevelWindow' seconds of
+        frames, not just this block, so they don't depend on the block
+        size, and only set again after 'LevelUpdate' new frames.
+
+        Returns a boolean array of the bins that are new carriers.
+        """
+
+        fresh = not self.count
+
+        # put the newest frames in the ring, oldest overwritten
+        size = len(self.history)
+        recent = mags[-size:]
+        audio.ring_write(self.history, self.count, recent)
+        self.count += len(recent)
+
+        self.since += len(mags)
+        if not fresh and self.since < Skimmer.LevelUpdate:
+            return np.zeros(len(self.active), dtype=bool)
+        seconds = self.since * self.frame_time
+        self.since = 0
+
+        window = self.history[:min(self.count, size)]
+        (floor, peak) = np.percentile(window, [Skimmer.FloorPercentile,
+                                               Skimmer.PeakPercentile], axis=0)
+        if fresh:
+            self.floor = floor
+            self.peak = peak
+        else:
+            self.floor = np.minimum(floor,
+                                    self.floor * Skimmer.FloorRise**seconds)
+            self.peak = np.maximum(peak, self.peak * Skimmer.PeakDecay**seconds)
+
+        # the biggest of the neighbouring bins either side, and whether
+        # a neighbour is already a carrier
+        pad = np.pad(self.peak, Skimmer.Guard)
+        pad_active = np.pad(self.active, Skimmer.Guard)
+        num = len(self.peak)
+        near = np.zeros(num)
+        far = np.zeros(num)
+        taken = np.zeros(num, dtype=bool)
+        for shift in range(1, Skimmer.Guard+1):
+            (left, right) = (pad[Skimmer.Guard-shift:][:num],
+                             pad[Skimmer.Guard+shift:][:num])
+            if shift <= Skimmer.Spread:
+                near = np.maximum(near, np.maximum(left, right))
+                taken |= pad_active[Skimmer.Guard-shift:][:num]
+                taken |= pad_active[Skimmer.Guard+shift:][:num]
+            far = np.maximum(far, np.maximum(left, right))
+
+        # a tone between two bins must not hop from one to the other, so
+        # a carrier keeps its bin until a neighbour is clearly bigger
+        held = self.active & (Skimmer.Hold * self.peak > near)
+        found = ~taken & (self.peak > near)
+        active = ((held | found)
+                  & (self.peak > Skimmer.MinRatio * self.floor)
+                  & (self.peak >= Skimmer.Mask * far)
+                  & (self.peak >= Skimmer.Range * self.peak.max()))
+        new = active & ~self.active
+        self.active = active
+        return new
+
+    def _emit(self, b, char, found):
+        """Add 'char' to the text of bin 'b'."""
+
+        self.texts[b].append(char)
+        found.append((self.frequencies[b], char))
+
+    def _end_char(self, b, found):
+        """Output the character pending in bin 'b', if any."""
+
+        node = int(self.node[b])
+        if node != morse_code.CodeTree.Root:
+            self._emit(b, morse_code.Tree.decode(node), found)
+            self.node[b] = morse_code.CodeTree.Root
+            self.spaced[b] = False
+
+    def _gap(self, b, gap, found):
+        """Bin 'b' has been quiet for 'gap' frames."""
+
+        dot = self.dot[b]
+        if gap >= 2*dot:
+            self._end_char(b, found)
+            if gap >= 5*dot and not self.spaced[b]:
+                self._emit(b, ' ', found)
+                self.spaced[b] = True
+
+    def _mark(self, b, length):
+        """Bin 'b' has had a mark of 'length' frames."""
+
+        (dot, dash) = (self.dot[b], self.dash[b])
+        if not dot:
+            # the first mark, take it as a dot until we know better
+            (dot, dash) = (length, 3*length)
+        elif length > 2*dash:
+            # much slower than we thought
+            (dot, dash) = (length/3, length)
+        elif 2*length < dot:
+            # much faster, what we thought were dots are dashes
+            (dot, dash) = (length, dot)
+
+        is_dash = length > (dot + dash)/2
+        if is_dash:
+            dash += Skimmer.Adapt * (length - dash)
+        else:
+            dot += Skimmer.Adapt * (length - dot)
+        (self.dot[b], self.dash[b]) = (dot, max(dash, 2*dot))
+
+        # no code starts with the elements so far, the rest are ignored
+        node = int(self.node[b])
+        if morse_code.Tree.possible(node):
+            self.node[b] = morse_code.Tree.step(node, is_dash)
+
+    def process(self, samples):
+        """Decode a block of samples, return a list of (frequency, text)."""
+
+        mags = self._frames(samples)
+        found = []
+        if not len(mags):
+            return found
+        new = self._levels(mags)
+        threshold = (self.peak + self.floor) / 2
+
+        # a new carrier starts a new character, skipping any mark under way
+        self.keyed[new] = mags[0, new] > threshold[new]
+        self.edge[new] = np.where(self.keyed[new], -1, self.frame)
+        self.fall[new] = self.frame
+        self.node[new] = morse_code.CodeTree.Root
+        self.spaced[new] = True
+
+        # key state of every bin in every frame, and where it changes
+        keyed = np.vstack((self.keyed, mags > threshold))
+        changes = (keyed[1:] != keyed[:-1]) & self.active
+        (frames, bins) = np.nonzero(changes)
+
+        for (f, b) in zip(frames.tolist(), bins.tolist()):
+            now = self.frame + f
+            if keyed[f+1, b]:
+                self._gap(b, now - self.fall[b], found)
+                self.edge[b] = now
+            elif self.edge[b] < 0:
+                self.fall[b] = now
+            else:
+                length = now - self.edge[b]
+                if length >= self.min_mark:
+                    self._mark(b, length)
+                    self.fall[b] = now
+
+        self.keyed = keyed[-1].copy()
+        self.frame += len(mags)
+
+        # end characters and words in bins that have gone quiet
+        quiet = ~self.keyed & (self.frame - self.fall >= 2*self.dot)
+        quiet &= ((self.node != morse_code.CodeTree.Root) | ~self.spaced)
+        quiet |= ~self.active & (self.node != morse_code.CodeTree.Root)
+        for b in np.flatnonzero(quiet).tolist():
+            if self.active[b]:
+                self._gap(b, self.frame - self.fall[b], found)
+            else:
+                self._end_char(b, found)
+
+        return self._merge(found)
+
+    def finish(self):
+        """Return the characters still pending at the end of the input."""
+
+        found = []
+        for b in np.flatnonzero(self.node != morse_code.CodeTree.Root):
+            self._end_char(int(b), found)
+        return self._merge(found)
+
+    def _merge(self, found):
+        """Join the characters found into text, per frequency."""
+
+        texts = {}
+        for (frequency, char) in found:
+            texts[frequency] = texts.get(frequency, '') + char
+        return list(texts.items())
+
+    def channels(self):
+        """Return a dict mapping frequency to the text decoded there."""
+
+        return {self.frequencies[b]: ''.join(text)
+                for (b, text) in enumerate(self.texts) if text}
+
+
+if __name__ == '__main__':
+    import sys
+    import getopt
+
+    import pcm_file
+
+    # samples read per call
+    Block = 4096
+
+    def usage(msg=None):
+        if msg:
+            print(('*'*80 + '\n%s\n' + '*'*80) % msg)
+        print("\n"
+              "CLI program to decode every morse signal in a recording and\n"
+              "print the text found at each frequency.\n\n"
+              "Usage: skimmer [-h] [-l low] [-r rate] [-s size] [-u high]\n"
+              "               filename\n\n"
+              "where -h           means print this help and stop\n"
+              "      -l low       means lowest frequency decoded (hertz)\n"
+              "      -r rate      means sample rate of a raw PCM file\n"
+              "      -s size      means use STFT frames of 'size' samples\n"
+              "      -u high      means highest frequency decoded (hertz)")
+
+    # parse the CLI params
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'hl:r:s:u:',
+                                     ['help', 'low=', 'rate=', 'size=',
+                                      'high='])
+    except getopt.GetoptError as err:
+        usage(err)
+        sys.exit(1)
+
+    low = 200
+    high = 3000
+    rate = None
+    size = None
+    try:
+        for (opt, param) in opts:
+            if opt in ['-h', '--help']:
+                usage()
+                sys.exit(0)
+            elif opt in ['-l', '--low']:
+                low = int(param)
+            elif opt in ['-r', '--rate']:
+                rate = int(param)
+            elif opt in ['-s', '--size']:
+                size = int(param)
+            elif opt in ['-u', '--high']:
+                high = int(param)
+    except ValueError:
+        usage("Option '%s' must be followed by a number" % opt)
+        sys.exit(1)
+
+    if len(args) != 1:
+        usage('You must give one recording to decode')
+        sys.exit(1)
+
+    source = pcm_file.PCMFile(args[0], rate=rate)
+    skim = Skimmer(rate=source.rate, size=size, low=low, high=high)
+    while True:
+        data = source.read(Block)
+        if not len(data):
+            break
+        skim.process(data)
+    skim.finish()
+    source.close()
+
+    for (frequency, text) in sorted(skim.channels().items()):
+        print('%7.1f Hz\t%s' % (frequency, ' '.join(text.split())))
@@ -0,0 +1,188 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Phase-continuous tone synthesis for SendMorse.
+
+The transmission is described as a timeline of (duration, keyed) pairs
+with durations in seconds.  Element edges are placed at the nearest
+sample to their exact time on the whole timeline, so there is no timing
+drift however long the text.  The carrier is a function of the absolute
+sample number, so its phase is continuous across elements.
+
+synth = Synth(rate, frequency, volume, shape, rise_time)
+---------------------------------------------------------
+'shape' is the keying envelope: None, 'cosine' or 'blackman'.
+
+samples = synth.render(timeline)
+--------------------------------
+Return float32 samples for a list of (duration, keyed) pairs, following
+on from the previous call.  The last few samples are held back (a keying
+ramp may still need to be added to them).
+
+samples = synth.flush()
+-----------------------
+Return the held back samples and finish the transmission.
+
+synth.reset()
+-------------
+Start a new transmission.
+"""
+
+import math
+import numpy as np
+
+
+class Synth:
+    """Render a keyed tone with sample-accurate, phase-continuous timing."""
+
+    # keying envelope shapes, None means hard keying (clicks!)
+    Shapes = (None, 'cosine', 'blackman')
+
+    def __init__(self, rate, frequency, volume, shape='cosine',
+                 rise_time=0.005, min_gap=None):
+        """Prepare the synthesizer.
+
+        rate       sample rate (samples/second)
+        frequency  tone frequency (hertz)
+        volume     tone amplitude in [0.0, 1.0]
+        shape      keying envelope shape
+        rise_time  keying envelope rise/fall time (seconds)
+        min_gap    shortest silence on the timeline (seconds), the rise
+                   time is limited to this so ramps never overlap
+        """
+
+        if shape not in Synth.Shapes:
+            raise Exception("Keying shape must be one of %s, got '%s'"
+                            % (str(Synth.Shapes), shape))
+
+        self.rate = rate
+        self.frequency = frequency
+        self.volume = volume
+        self.shape = shape
+
+        # ramp length in samples, centred on the nominal element edges
+        if shape is None:
+            rise_time = 0.0
+        if min_gap is not None:
+            rise_time = min(rise_time, min_gap)
+        self.ramp_len = int(round(rise_time * rate))
+        self.rise = self.keying_ramp(self.ramp_len)
+
+        # precomputed carrier blocks, extended when a longer one is needed
+        self.omega = 2 * math.pi * frequency / rate
+        self.cos_table = np.zeros(0)
+        self.sin_table = np.zeros(0)
+
+        # shaped element envelopes, keyed on element length in samples
+        self.envelopes = {}
+
+        self.reset()
+
+    def reset(self):
+        """Start a new transmission."""
+
+        # start the timeline one ramp length in, so the first ramp fits
+        self.time = self.ramp_len / self.rate
+        self.base = 0                       # absolute index of pending[0]
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def keying_ramp(self, length):
+        """Return the rising edge of the keying envelope.
+
+        length  number of samples in the ramp
+
+        The falling edge is the reverse of the rising edge.
+        """
+
+        if self.shape == 'cosine':
+            # raised cosine, 0.0 to 1.0
+            return 0.5 - 0.5*np.cos(np.pi * np.arange(length) / length)
+        # first half of a Blackman window of twice the length
+        return np.blackman(2*length + 1)[:length]
+
+    def envelope(self, length):
+        """Return the shaped envelope of a keyed element.
+
+        length  nominal element length in samples
+
+        The result is 'ramp_len' samples longer than the element.
+        """
+
+        try:
+            return self.envelopes[length]
+        except KeyError:
+            pass
+
+        ramp = self.ramp_len
+        env = np.ones(length + ramp)
+        if ramp:
+            env[:ramp] = self.rise
+            env[-ramp:] = np.minimum(env[-ramp:], self.rise[::-1])
+        env *= self.volume
+
+        self.envelopes[length] = env
+        return env
+
+    def carrier(self, start, length):
+        """Return 'length' samples of the carrier from absolute 'start'.
+
+        Uses the precomputed blocks and the angle addition formula, so
+        the phase depends only on the absolute sample number.
+        """
+
+        if length > len(self.cos_table):
+            k = np.arange(max(length, 2*len(self.cos_table)))
+            self.cos_table = np.cos(self.omega * k)
+            self.sin_table = np.sin(self.omega * k)
+
+        cycles = math.fmod(self.frequency * start, self.rate) / self.rate
+        phase = 2 * math.pi * cycles
+        return (math.sin(phase) * self.cos_table[:length]
+                + math.cos(phase) * self.sin_table[:length])
+
+    def _extend(self, length):
+        """Make sure the pending samples are at least 'length' long."""
+
+        if length > len(self.pending):
+            self.pending = np.concatenate((self.pending,
+                                           np.zeros(length - len(self.pending),
+                                                    dtype=np.float32)))
+
+    def render(self, timeline):
+        """Render a list of (duration, keyed) pairs.
+
+        Returns the float32 samples that are now final.
+        """
+
+        half = self.ramp_len // 2
+
+        for (duration, keyed) in timeline:
+            if keyed:
+                start = int(round(self.time * self.rate))
+                stop = int(round((self.time + duration) * self.rate))
+                env = self.envelope(stop - start)
+                first = start - half
+                offset = first - self.base
+                self._extend(offset + len(env))
+                sound = env * self.carrier(first, len(env))
+                self.pending[offset:offset+len(env)] += sound
+            self.time += duration
+
+        # everything up to the end of the timeline is silence if not keyed
+        end = int(round(self.time * self.rate))
+        self._extend(end - self.base)
+
+        # samples before the next possible ramp start are final
+        final = max(0, end - self.ramp_len - self.base)
+        result = self.pending[:final]
+        self.pending = self.pending[final:]
+        self.base += final
+        return result
+
+    def flush(self):
+        """Return all held back samples and end the transmission."""
+
+        result = self.pending
+        self.reset()
+        return result
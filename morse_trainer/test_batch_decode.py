@@ -0,0 +1,81 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'batch_decode' module.
+
+Sends text at a few speeds into .WAV files, as test_replay does, and
+decodes the directory twice, once serially with one ReadMorse per file
+and once in parallel with short segments so each file is split a few
+times.  The parallel characters must be the same as the serial ones.
+SendMorse leaves a word gap after every character, right on the reader's
+char/word space threshold, so the spacing may differ and the text is
+compared without spaces.  No audio device is needed.
+"""
+
+import os
+import sys
+import tempfile
+
+import audio
+import pcm_file
+import replay
+import batch_decode
+from send_morse import SendMorse
+from receive_morse import ReadMorse
+
+
+Speeds = (12, 20, 30)
+
+# short segments and overlaps so the test files are split
+Segment = 5
+Overlap = 2
+
+
+def decode_serial(filename):
+    """Decode a whole recording with one ReadMorse, return the text."""
+
+    morse = ReadMorse(source=pcm_file.PCMFile(filename))
+    chars = []
+    try:
+        while True:
+            chars.append(morse.read_morse())
+    except EOFError:
+        pass
+    morse.close()
+    return ''.join(chars)
+
+
+if __name__ == '__main__':
+    text = ' '.join(sys.argv[1:]) or ('CQ CQ DE VK2ABC VK2ABC K  '
+                                      'VK2ABC DE VK3XYZ GM OM TNX FER CALL  '
+                                      'UR RST 599 599 NAME IS JOHN  '
+                                      'THE QUICK BROWN FOX JUMPS OVER THE '
+                                      'LAZY DOG 0123456789  SK')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for wpm in Speeds:
+            name = os.path.join(directory, 'wpm%02d.wav' % wpm)
+            sink = audio.WavOutput(name, rate=SendMorse.SampleRate)
+            SendMorse(cwpm=wpm, wpm=wpm, sink=sink).send(text)
+            sink.close()
+
+        failed = False
+        for (filename, parallel) in batch_decode.decode_directory(
+                directory, jobs=2, segment=Segment, overlap=Overlap):
+            serial = decode_serial(filename)
+            num_jobs = len(batch_decode.make_jobs(filename, Segment, Overlap,
+                                                  None, None, None))
+            same = parallel.replace(' ', '') == serial.replace(' ', '')
+            failed = failed or not same
+            print('%-10s %2d segments, parallel %s serial: %s'
+                  % (os.path.basename(filename), num_jobs,
+                     'same as' if same else 'DIFFERS from',
+                     ' '.join(serial.split())))
+            if not same:
+                for line in replay.differences(parallel.replace(' ', ''),
+                                               serial.replace(' ', '')):
+                    print('    %s' % line)
+
+        if failed:
+            sys.exit(2)
@@ -0,0 +1,54 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'corpus' module.
+
+Builds a small corpus in a temporary directory, builds it again (which
+must reuse the first), and decodes a few clips with a ReadMorse, showing
+the sent text, the chosen clip parameters and the received text.  No
+audio device is needed.
+"""
+
+import sys
+import time
+import tempfile
+
+import corpus
+from receive_morse import ReadMorse
+
+
+NumClips = 64
+NumShown = 8
+
+
+if __name__ == '__main__':
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.time()
+        clips = corpus.generate(directory, NumClips, seed=seed)
+        built = time.time() - start
+
+        start = time.time()
+        again = corpus.generate(directory, NumClips, seed=seed)
+        reused = time.time() - start
+
+        print('%d clips built in %.2fs, reused in %.3fs, same texts: %s'
+              % (len(clips), built, reused, clips.texts == again.texts))
+
+        for i in range(NumShown):
+            reader = ReadMorse(source=clips.source(i))
+            received = []
+            try:
+                while True:
+                    received.append(reader.read_morse())
+            except EOFError:
+                pass
+
+            params = clips.index[i]
+            print('wpm=%4.1f-%4.1f snr=%4.1fdB qsb=%.2f jitter=%.2f'
+                  % (params['wpm'], params['wpm_end'], params['snr'],
+                     params['qsb_depth'], params['jitter']))
+            print('    sent:     %s' % clips.texts[i])
+            print('    received: %s' % ' '.join(''.join(received).split()))
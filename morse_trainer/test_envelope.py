@@ -0,0 +1,45 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'envelope' module.
+
+Builds a keyed tone in memory and prints the (count, level) tokens
+produced by the envelope stages.  No audio device is needed.
+"""
+
+import math
+import numpy as np
+from envelope import Envelope, Hysteresis
+
+
+Rate = 8000
+Frequency = 750
+
+
+def tone(duration, volume):
+    length = int(duration * Rate)
+    factor = float(Frequency) * (math.pi * 2) / Rate
+    return (np.sin(np.arange(length) * factor) * 20000 * volume).astype(np.int16)
+
+
+if __name__ == '__main__':
+    # 'A' then 'N' at about 10 wpm
+    dot = 0.12
+    samples = np.concatenate((tone(dot, 1), tone(dot, 0), tone(3*dot, 1),
+                              tone(3*dot, 0),
+                              tone(3*dot, 1), tone(dot, 0), tone(dot, 1),
+                              tone(7*dot, 0)))
+
+    for mode in Envelope.Modes:
+        env = Envelope(chunk=16, mode=mode)
+        hyst = Hysteresis(silence=20, hold=2)
+        hyst.push(env.process(samples))
+
+        tokens = []
+        while True:
+            token = hyst.next(threshold=5000)
+            if token is None:
+                break
+            tokens.append(token)
+        print('%s: %s' % (mode, str(tokens)))
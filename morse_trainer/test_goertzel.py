@@ -0,0 +1,49 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'goertzel' module.
+
+Builds a keyed 750Hz tone with a loud steady 1500Hz interferer and
+prints the tokens seen by the broadband envelope and the Goertzel
+detector.  No audio device is needed.
+"""
+
+import math
+import numpy as np
+from envelope import Envelope, Hysteresis
+from goertzel import Goertzel
+
+
+Rate = 8000
+
+
+def tone(frequency, duration, volume):
+    length = int(duration * Rate)
+    factor = float(frequency) * (math.pi * 2) / Rate
+    return np.sin(np.arange(length) * factor) * 10000 * volume
+
+
+def tokens(detector, samples, threshold):
+    hyst = Hysteresis(silence=20, hold=2)
+    hyst.push(detector.process(samples))
+
+    result = []
+    while True:
+        token = hyst.next(threshold)
+        if token is None:
+            return result
+        result.append(token)
+
+
+if __name__ == '__main__':
+    # 'A' at about 10 wpm, keyed at 750Hz
+    dot = 0.12
+    keyed = np.concatenate((tone(750, dot, 1), tone(750, dot, 0),
+                            tone(750, 3*dot, 1), tone(750, 7*dot, 0)))
+    noise = tone(1500, len(keyed)/Rate, 1)
+    samples = (keyed + noise).astype(np.int16)
+
+    print('envelope: %s' % str(tokens(Envelope(chunk=16), samples, 4000)))
+    print('goertzel: %s' % str(tokens(Goertzel(frequency=750, rate=Rate),
+                                      samples, 4000)))
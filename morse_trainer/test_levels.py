@@ -0,0 +1,53 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'levels' module.
+
+Sends text into a 'noisy room': a second of noise before the sending
+starts, background noise and loud clicks.  It is decoded by a ReadMorse
+whose threshold comes from a LevelEstimator.  No audio device is needed.
+"""
+
+import sys
+
+import numpy as np
+
+import audio
+from send_morse import SendMorse
+from receive_morse import ReadMorse
+
+
+# noise level and click size, relative to full scale
+Noise = 0.03
+Click = 0.9
+NumClicks = 40
+
+
+if __name__ == '__main__':
+    text = ' '.join(sys.argv[1:]) or 'CQ CQ DE VK2ABC PARIS THE QUICK BROWN FOX'
+    rate = SendMorse.SampleRate
+    rng = np.random.default_rng(0)
+
+    sender = SendMorse(volume=0.3, cwpm=20, wpm=20)
+    sound = np.concatenate((np.zeros(rate), sender.render(text)))
+    sound += rng.normal(0, Noise, len(sound))
+    for start in rng.integers(0, len(sound), NumClicks):
+        sound[start:start+8] += Click * rng.choice((-1, 1))
+
+    loopback = audio.Loopback(rate=rate)
+    loopback.write(np.clip(sound, -1, 1).astype(np.float32))
+    reader = ReadMorse(source=loopback)
+
+    received = []
+    try:
+        while True:
+            received.append(reader.read_morse())
+    except EOFError:
+        pass
+
+    print('sent:     %s' % text)
+    print('received: %s' % ' '.join(''.join(received).split()))
+    print('noise=%d peak=%d threshold=%d snr=%.1fdB'
+          % (reader.min_signal, reader.max_signal,
+             reader.signal_threshold, reader.snr))
@@ -0,0 +1,101 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'logger' module.
+
+For a direct and a threaded log, shows:
+    levels    lines below the log level are not written, those at or
+              above are, formatted with their arguments
+    caller    each line has the line number of the log call
+    close     threads still logging while the log is closed don't crash,
+              and the trailer counts every line written
+    after     log calls after close() are ignored
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import logger
+
+
+def check(name, ok, detail=''):
+    """Print the result of one check, return 'ok'."""
+
+    print('%-8s %-4s %s' % (name, 'ok' if ok else 'FAIL', detail))
+    return ok
+
+
+def run(filename, threaded):
+    """Check one log file, return True if all OK."""
+
+    log = logger.Log(filename, logger.Log.DEBUG, threaded=threaded,
+                     queue_size=100)
+    log.set_level(logger.Log.INFO)
+    line = sys._getframe().f_lineno
+    log.debug('hidden %d', 1)
+    log.info('shown %d', 2)
+    log('called')
+    log.warn('warned %s', 'here')
+    log.set_level(logger.Log.DEBUG)     # so the trailer is written
+
+    # several threads logging while the log is closed
+    stop = threading.Event()
+    def worker():
+        while not stop.is_set():
+            log.info('busy')
+    threads = [threading.Thread(target=worker) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    log.close()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    # none of these may raise
+    failed = None
+    try:
+        log('after')
+        log.error('after %d', 1)
+        log.set_level(logger.Log.DEBUG)
+        log.flush()
+        log.close()
+    except Exception as e:
+        failed = e
+
+    with open(filename) as fd:
+        lines = fd.read().splitlines()
+    messages = [l.split('|', 3)[3] for l in lines]
+    numbers = [int(l.split('|')[2].split(':')[1]) for l in lines]
+    start = messages.index('Logging level set to 20 (INFO)') + 1
+    closed = [i for (i, m) in enumerate(messages) if m.startswith('Log closed')]
+
+    ok = True
+    ok &= check('levels', messages[start:start+3] == ['shown 2', 'called',
+                                                      'warned here'],
+                '%s' % messages[start:start+3])
+    ok &= check('caller', numbers[start:start+3] == [line+2, line+3, line+4],
+                'lines %s' % numbers[start:start+3])
+    if closed:
+        written = int(messages[closed[0]].split()[2])
+        ok &= check('close', len(closed) == 1 and written == closed[0],
+                    ', '.join(messages[closed[0]:]))
+    else:
+        ok &= check('close', False, 'no trailer')
+    ok &= check('after', failed is None and 'after' not in messages,
+                'raised %r' % failed if failed else '')
+    return ok
+
+
+if __name__ == '__main__':
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        for threaded in (False, True):
+            print('%s:' % ('threaded' if threaded else 'direct'))
+            ok &= run(os.path.join(directory, 'test.log'), threaded)
+    if not ok:
+        sys.exit(2)
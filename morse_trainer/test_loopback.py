@@ -0,0 +1,40 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'audio' module loopback.
+
+Sends text with SendMorse into an audio.Loopback and decodes it with
+ReadMorse, faster than real time and with no sound card.
+"""
+
+import sys
+import time
+
+import audio
+from send_morse import SendMorse
+from receive_morse import ReadMorse
+
+
+if __name__ == '__main__':
+    text = ' '.join(sys.argv[1:]) or 'PARIS PARIS CQ DE VK2'
+
+    loopback = audio.Loopback(rate=SendMorse.SampleRate)
+    sender = SendMorse(cwpm=20, wpm=20, sink=loopback)
+    reader = ReadMorse(source=loopback)
+
+    start = time.time()
+    sender.send(text)
+    duration = len(loopback) / loopback.rate
+
+    received = []
+    try:
+        while True:
+            received.append(reader.read_morse())
+    except EOFError:
+        pass
+    delta = time.time() - start
+
+    print('sent:     %s' % text)
+    print('received: %s' % ''.join(received))
+    print('%.1fs of audio in %.2fs' % (duration, delta))
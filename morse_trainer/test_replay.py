@@ -0,0 +1,59 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'replay' module.
+
+Sends text at a few speeds into .WAV files, with a reference .txt file
+for each, and decodes each one once to record a token trace.  Both the
+recordings and the traces are then replayed, the traces must decode to
+the same text as the audio.  SendMorse leaves a word gap after every
+character so the text is compared without spaces.  No audio device is
+needed.
+"""
+
+import os
+import sys
+import tempfile
+
+import audio
+import pcm_file
+import replay
+import token_trace
+from send_morse import SendMorse
+from receive_morse import ReadMorse
+
+
+Speeds = (10, 20, 30)
+
+
+if __name__ == '__main__':
+    text = ' '.join(sys.argv[1:]) or 'CQ CQ DE VK2ABC PARIS THE QUICK BROWN FOX'
+
+    with tempfile.TemporaryDirectory() as directory:
+        for wpm in Speeds:
+            name = os.path.join(directory, 'wpm%02d' % wpm)
+            sink = audio.WavOutput(name + '.wav', rate=SendMorse.SampleRate)
+            SendMorse(cwpm=wpm, wpm=wpm, sink=sink).send(text)
+            sink.close()
+            with open(name + '.txt', 'w') as fd:
+                fd.write(text + '\n')
+
+            # decode the audio once, recording the tokens
+            trace = token_trace.TokenTrace()
+            reader = ReadMorse(source=pcm_file.PCMFile(name + '.wav'),
+                               trace=trace)
+            try:
+                while True:
+                    reader.read_morse()
+            except EOFError:
+                pass
+            trace.dump(name + '.trc')
+
+        for filename in replay.find_sessions([directory]):
+            (received, tokens, seconds) = replay.replay_file(filename)
+            (errors, length) = replay.compare(received.replace(' ', ''),
+                                              text.replace(' ', ''))
+            print('%-10s %5d tokens %6.0f tokens/s, %d/%d errors: %s'
+                  % (os.path.basename(filename), tokens, tokens/seconds,
+                     errors, length, ' '.join(received.split())))
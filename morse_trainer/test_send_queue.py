@@ -0,0 +1,98 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'send_queue' module.
+
+Plays into an audio.Loopback that takes a twentieth of real time per
+write, so jobs are still playing when they are cancelled.  Shows:
+    flush     all queued jobs are played, in order, with their callbacks
+    speeds    a job queued before the speeds change is sent at the old
+              speed, one queued after at the new speed
+    cancel    cancelling mid-job stops the playing and drops the queued
+              jobs without callbacks, a job queued afterwards still plays
+No audio device is needed.
+"""
+
+import sys
+import time
+
+import audio
+from send_morse import SendMorse
+from send_queue import SendQueue
+
+
+# fraction of real time a write to the sink takes
+Speedup = 0.05
+
+
+class SlowLoopback(audio.Loopback):
+    """A loopback sink that takes time to 'play' what is written."""
+
+    def write(self, data):
+        time.sleep(Speedup * len(data) / self.rate)
+        super().write(data)
+
+
+def check(name, ok, detail=''):
+    """Print the result of one check, return 'ok'."""
+
+    print('%-8s %-4s %s' % (name, 'ok' if ok else 'FAIL', detail))
+    return ok
+
+
+if __name__ == '__main__':
+    text = ' '.join(sys.argv[1:]) or 'CQ CQ DE VK2ABC'
+
+    sink = SlowLoopback(rate=SendMorse.SampleRate)
+    sender = SendMorse(cwpm=20, wpm=20, sink=sink)
+    reference = SendMorse(cwpm=20, wpm=20)
+    send_queue = SendQueue(sender)
+    ok = True
+
+    # flush: everything is played in order
+    done = []
+    for i in range(3):
+        send_queue.enqueue(text, callback=done.append)
+    flushed = send_queue.flush(timeout=30)
+    expected = 3 * len(reference.render(text))
+    ok &= check('flush', flushed and done == [0, 1, 2]
+                         and len(sink) == expected,
+                'callbacks %s, %d of %d samples'
+                % (done, len(sink), expected))
+    sink.close()
+
+    # speeds: each job keeps the speeds it was queued with
+    send_queue.enqueue(text)
+    sender.set_speeds(30, 30)
+    send_queue.enqueue(text)
+    send_queue.flush(timeout=30)
+    slow = len(reference.render(text))
+    reference.set_speeds(30, 30)
+    fast = len(reference.render(text))
+    ok &= check('speeds', len(sink) == slow + fast,
+                '%d samples, %d at 20 wpm + %d at 30 wpm'
+                % (len(sink), slow, fast))
+    sink.close()
+
+    # cancel: playing stops and queued jobs are dropped without callbacks
+    done = []
+    for i in range(3):
+        send_queue.enqueue(text, callback=done.append)
+    time.sleep(Speedup * fast / sink.rate / 2)
+    send_queue.cancel()
+    flushed = send_queue.flush(timeout=0)
+    time.sleep(Speedup * 3 * fast / sink.rate)
+    played = len(sink)
+    ok &= check('cancel', flushed and not done and played < fast,
+                'callbacks %s, %d of %d samples played'
+                % (done, played, 3*fast))
+
+    job = send_queue.enqueue(text, callback=done.append)
+    flushed = send_queue.flush(timeout=30)
+    ok &= check('after', flushed and done == [job],
+                'callbacks %s' % done)
+
+    send_queue.close()
+    if not ok:
+        sys.exit(2)
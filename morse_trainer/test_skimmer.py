@@ -0,0 +1,59 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'skimmer' module.
+
+Renders a 'classroom' of oscillators, each on its own frequency and at
+its own speed, mixes them with some noise and decodes the mix with one
+Skimmer, from big file sized blocks and again from small live sized
+blocks.  The text should be the same.  No audio device is needed.
+"""
+
+import numpy as np
+
+from send_morse import SendMorse
+from skimmer import Skimmer
+
+
+# (frequency, wpm, text) of each oscillator
+Students = [
+            (600, 15, 'CQ CQ DE VK2ABC PARIS'),
+            (900, 25, 'THE QUICK BROWN FOX JUMPS'),
+            (1300, 10, 'HELLO WORLD 73 SK'),
+            (1700, 30, 'NOW IS THE TIME FOR ALL'),
+           ]
+
+# noise level, relative to full scale
+Noise = 0.01
+
+# samples per Skimmer.process() call, a file block and a live block
+Blocks = (4096, 64)
+
+
+if __name__ == '__main__':
+    rate = SendMorse.SampleRate
+
+    sounds = []
+    for (frequency, wpm, text) in Students:
+        sender = SendMorse(frequency=frequency, cwpm=wpm, wpm=wpm)
+        sounds.append(sender.render(text))
+
+    mix = np.zeros(max(len(sound) for sound in sounds) + rate)
+    for sound in sounds:
+        mix[:len(sound)] += sound / len(sounds)
+    mix += np.random.default_rng(0).normal(0, Noise, len(mix))
+    samples = (np.clip(mix, -1, 1) * 32767).astype(np.int16)
+
+    for (frequency, wpm, text) in Students:
+        print('sent %4d Hz %2d wpm: %s' % (frequency, wpm, text))
+
+    for block in Blocks:
+        skim = Skimmer(rate=rate)
+        for start in range(0, len(samples), block):
+            skim.process(samples[start:start+block])
+        skim.finish()
+
+        print('%d sample blocks:' % block)
+        for (frequency, text) in sorted(skim.channels().items()):
+            print('read %6.1f Hz: %s' % (frequency, ' '.join(text.split())))
@@ -0,0 +1,44 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'timing' module.
+
+Sends text at speeds across the Speeds range into an audio.Loopback and
+decodes each with a fresh ReadMorse, so the timing clusters must lock on
+from scratch every time.  No audio device is needed.
+"""
+
+import sys
+
+import audio
+from send_morse import SendMorse
+from receive_morse import ReadMorse
+
+
+# the range of speeds.Speeds (which needs PyQt5)
+MinSpeed = 5
+MaxSpeed = 40
+
+
+if __name__ == '__main__':
+    text = ' '.join(sys.argv[1:]) or 'CQ CQ DE VK2ABC PARIS THE QUICK BROWN FOX'
+
+    for wpm in range(MinSpeed, MaxSpeed+1, 5):
+        loopback = audio.Loopback(rate=SendMorse.SampleRate)
+        sender = SendMorse(cwpm=wpm, wpm=wpm, sink=loopback)
+        reader = ReadMorse(source=loopback)
+
+        sender.send(text)
+
+        received = []
+        try:
+            while True:
+                received.append(reader.read_morse())
+        except EOFError:
+            pass
+
+        print('%2d wpm: %s' % (wpm, ' '.join(''.join(received).split())))
+        print('        dot=%d dash=%d char_space=%d word_space=%d'
+              % (reader.len_dot, reader.len_dash,
+                 reader.char_space, reader.word_space))
@@ -0,0 +1,83 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'tracker' module.
+
+Sends text from an 'oscillator' that drifts in frequency word by word,
+adds a loud steady hum and some noise, and decodes it through a ReadMorse
+with a ToneTracker front-end, then runs the same input through new
+trackers in different block sizes, which must give the same values.
+No audio device is needed.
+"""
+
+import sys
+
+import numpy as np
+
+import audio
+from send_morse import SendMorse
+from receive_morse import ReadMorse
+from tracker import ToneTracker
+
+
+# the oscillator starts at 'Start' hertz and drifts 'Drift' hertz per word
+Start = 520
+Drift = -8
+
+# block sizes (samples) the input is processed in, whole input first
+BlockSizes = (None, 10000, 1000, 333)
+
+# frequency and amplitude of the hum, and the noise level
+HumFrequency = 600
+HumLevel = 0.25
+Noise = 0.05
+
+
+if __name__ == '__main__':
+    text = ' '.join(sys.argv[1:]) or 'CQ CQ DE VK2ABC PARIS THE QUICK BROWN FOX'
+    rate = SendMorse.SampleRate
+
+    sender = SendMorse(cwpm=15, wpm=15)
+    sounds = []
+    for (i, word) in enumerate(text.split()):
+        sender.set_frequency(Start + i*Drift)
+        sounds.append(sender.render(word + ' '))
+    sound = np.concatenate(sounds)
+
+    times = np.arange(len(sound)) / rate
+    sound += HumLevel * np.sin(2 * np.pi * HumFrequency * times)
+    sound += np.random.default_rng(0).normal(0, Noise, len(sound))
+
+    loopback = audio.Loopback(rate=rate)
+    loopback.write(np.clip(sound, -1, 1).astype(np.float32))
+
+    chunk = ReadMorse.chunk_size(rate)
+    tracker = ToneTracker(rate=rate, chunk=chunk, length=8*chunk)
+    reader = ReadMorse(detector=tracker, source=loopback)
+
+    received = []
+    try:
+        while True:
+            received.append(reader.read_morse())
+    except EOFError:
+        pass
+
+    print('sent:     %s' % text)
+    print('received: %s' % ' '.join(''.join(received).split()))
+    print('tone drifted %d to %d Hz, tracker ended at %.1f Hz'
+          % (Start, Start + (len(sounds)-1)*Drift, tracker.frequency))
+
+    samples = (np.clip(sound, -1, 1) * 32767).astype(np.int16)
+    results = []
+    for size in BlockSizes:
+        size = size or len(samples)
+        tracker = ToneTracker(rate=rate, chunk=chunk, length=8*chunk)
+        results.append(np.concatenate([tracker.process(samples[i:i+size])
+                                       for i in range(0, len(samples), size)]))
+    same = all(np.array_equal(results[0], values) for values in results[1:])
+    print('blocks of %s samples give %s values'
+          % (', '.join(str(size) for size in BlockSizes[1:]),
+             'the same' if same else 'DIFFERENT'))
+    if not same:
+        sys.exit(2)
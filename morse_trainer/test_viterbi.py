@@ -0,0 +1,69 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test the 'viterbi' module.
+
+Renders a noisy, badly keyed clip with the corpus generator and decodes
+it with the greedy decoder and with the beam search decoder, showing the
+character errors of each.  Then pushes six dots into a one reading beam,
+which can't fit the sixth, to show the unknown code output.  No audio
+device is needed.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+import audio
+import corpus
+import replay
+import viterbi
+from receive_morse import ReadMorse
+
+
+# the clip's parameters, see corpus.IndexDtype
+Params = {
+          'wpm': 18.0,
+          'wpm_end': 22.0,
+          'jitter': 0.15,
+          'frequency': 700.0,
+          'drift': 20.0,
+          'qsb_depth': 0.3,
+          'qsb_rate': 0.2,
+          'snr': 14.0,
+          'volume': 0.5,
+         }
+
+
+if __name__ == '__main__':
+    text = ' '.join(sys.argv[1:]) or 'CQ CQ DE VK2ABC PARIS THE QUICK BROWN FOX'
+
+    rng = np.random.default_rng(1)
+    samples = corpus.render_clip(text, Params, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'noisy.wav')
+        sink = audio.WavOutput(filename, rate=corpus.Rate)
+        sink.write(samples / audio.Int16Scale)
+        sink.close()
+
+        print('sent:      %s' % text)
+        for beam in (False, True):
+            (received, _, seconds) = replay.replay_file(filename, beam=beam)
+            (errors, length) = replay.compare(received, text)
+            print('%-9s  %s' % ('beam:' if beam else 'greedy:',
+                                ' '.join(received.split())))
+            print('           %d/%d errors, %.2fs' % (errors, length, seconds))
+
+    # a one reading beam takes '5' for five short dots, a sixth can't fit
+    reader = ReadMorse(source=audio.Loopback(rate=ReadMorse.RATE))
+    beam = viterbi.BeamDecoder(reader, width=1)
+    dot = reader.len_dot * reader.value_time
+    chars = []
+    for i in range(6):
+        chars.extend(beam.push((ReadMorse.Element, 2*i*dot, ('.', dot))))
+    chars.extend(beam.finish())
+    print('six dots:  %r' % ''.join(chars))
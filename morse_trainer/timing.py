@@ -0,0 +1,165 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Online k-means clustering of mark and gap durations for the morse reader.
+
+Each model keeps the last 'window' durations in numpy arrays along with
+the cluster each was put in, and per-cluster sums and counts.  Adding a
+duration assigns it to the nearest cluster centre and drops the oldest
+one from the window, so an update costs the same however big the
+window.  One odd duration only moves one centre by 1/window of its
+error, so a single misclassified element can't drag the thresholds.
+
+A cluster with nothing in the window takes its centre from a 'unit'
+(the current dot length) given by the caller and the nominal morse
+ratios.  While a cluster is empty, or when a duration is far outside
+the clusters, the (small) window is re-split from scratch.  So a start
+far from the real speed (all dashes taken as dots, say) or a sudden
+change of speed locks on within a few characters.
+
+clusters = Clusters(ratios, window=16)
+--------------------------------------
+'ratios' are the nominal centres in dot units, (1, 3) for dot and dash
+marks, (1, 3, 7) for element, character and word gaps.
+
+label = clusters.add(duration, unit)
+------------------------------------
+Put 'duration' in the window, return the index of its cluster.
+
+centres = clusters.centres(unit)
+--------------------------------
+Return a numpy array of the cluster centres, shortest first.
+
+thresholds = clusters.thresholds(unit)
+--------------------------------------
+Return the decision thresholds, the midpoints between the centres.
+
+clusters.reset()
+----------------
+Empty the window.
+"""
+
+import numpy as np
+
+
+class Clusters:
+    """Online k-means over a sliding window of durations."""
+
+    # nominal mark and gap lengths, in dots
+    MarkRatios = (1, 3)
+    GapRatios = (1, 3, 7)
+
+    # a fresh split needs this many durations in each cluster
+    MinCount = 2
+
+    # k-means iterations for a fresh split
+    Iterations = 5
+
+    # a fresh split needs the centres at least this fraction of their
+    # nominal ratio apart
+    MinStep = 2 / 3
+
+    def __init__(self, ratios, window=16):
+        """Prepare the model.
+
+        ratios  nominal cluster centres in dot units
+        window  number of recent durations the centres are taken from
+        """
+
+        self.ratios = np.array(ratios, dtype=np.float64)
+        self.window = window
+        self.values = np.zeros(window, dtype=np.float64)
+        self.labels = np.zeros(window, dtype=np.int64)
+        self.sums = np.zeros(len(ratios), dtype=np.float64)
+        self.counts = np.zeros(len(ratios), dtype=np.int64)
+        self.total = 0          # durations ever added
+
+    def reset(self):
+        """Forget all durations."""
+
+        self.sums[:] = 0
+        self.counts[:] = 0
+        self.total = 0
+
+    def centres(self, unit):
+        """Return the cluster centres.
+
+        unit  dot length used for empty clusters
+        """
+
+        full = self.counts > 0
+        centres = self.ratios * unit
+        centres[full] = self.sums[full] / self.counts[full]
+
+        # keep the clusters in order
+        return np.maximum.accumulate(centres)
+
+    def thresholds(self, unit):
+        """Return the midpoints between the cluster centres."""
+
+        centres = self.centres(unit)
+        return (centres[:-1] + centres[1:]) / 2
+
+    def add(self, duration, unit):
+        """Add a duration, return the index of the cluster it is put in.
+
+        duration  the mark or gap length
+        unit      dot length used for empty clusters
+        """
+
+        centres = self.centres(unit)
+        thresholds = (centres[:-1] + centres[1:]) / 2
+        label = int(np.searchsorted(thresholds, duration))
+        outside = not centres[0]/2 <= duration <= 2*centres[-1]
+
+        slot = self.total % self.window
+        if self.total >= self.window:
+            old = self.labels[slot]
+            self.sums[old] -= self.values[slot]
+            self.counts[old] -= 1
+
+        self.values[slot] = duration
+        self.labels[slot] = label
+        self.sums[label] += duration
+        self.counts[label] += 1
+        self.total += 1
+
+        if outside or not self.counts.all():
+            label = self._resplit(slot, label)
+
+        return label
+
+    def _resplit(self, slot, label):
+        """Try a fresh k-means of the window.
+
+        Starts from the nominal ratios scaled to the shortest duration.
+        The new clusters are used only if every one has at least
+        'MinCount' durations and the centres are at least 'MinStep' of
+        their nominal ratios apart.  Returns the new label of 'slot'.
+        """
+
+        num = min(self.total, self.window)
+        if num < len(self.ratios) * Clusters.MinCount:
+            return label
+        values = self.values[:num]
+
+        centres = self.ratios * values.min()
+        for _ in range(Clusters.Iterations):
+            thresholds = (centres[:-1] + centres[1:]) / 2
+            labels = np.searchsorted(thresholds, values)
+            counts = np.bincount(labels, minlength=len(centres))
+            if (counts < Clusters.MinCount).any():
+                return label
+            centres = np.bincount(labels, weights=values,
+                                  minlength=len(centres)) / counts
+
+        steps = centres[1:] / centres[:-1]
+        nominal = self.ratios[1:] / self.ratios[:-1]
+        if (steps < nominal * Clusters.MinStep).any():
+            return label
+
+        self.labels[:num] = labels
+        self.sums[:] = centres * counts
+        self.counts[:] = counts
+        return int(labels[slot])
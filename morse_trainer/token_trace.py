@@ -0,0 +1,181 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Binary trace of the (count, level) tokens seen by the morse decoder.
+
+Logging a text line per token is slow and makes huge files.  A trace
+puts one fixed size record per token into a preallocated numpy ring and
+only writes it out when asked, so it can be left on all the time.  When
+the ring is full the oldest records are overwritten.
+
+Each record holds:
+    time       seconds, when the token ended
+    count      the token count (-N silence, N sound)
+    level      the token level
+    threshold  the SOUND/SILENCE threshold at the time
+    len_dot    the dot length (envelope values)
+    len_dash   the dash length (envelope values)
+
+The file is an 8 byte magic string, the number of records ever added and
+the number in the file (both little-endian uint64), then the records,
+oldest first, in the numpy 'TokenTrace.Dtype' layout.
+
+trace = TokenTrace(size=65536)
+------------------------------
+Prepare a ring of 'size' records.
+
+trace.record(time, count, level, threshold, len_dot, len_dash)
+--------------------------------------------------------------
+Add one record.
+
+records = trace.records()
+-------------------------
+Return a numpy structured array of the records held, oldest first.
+
+trace.dump(filename)
+--------------------
+Write the records held to a trace file.
+
+(records, total) = load(filename)
+---------------------------------
+Read a trace file, return the records as a numpy structured array and
+the number of records ever added (more than len(records) if some were
+overwritten).
+"""
+
+import numpy as np
+
+
+class TokenTrace:
+    """A ring of fixed size token records."""
+
+    # the record layout, also the layout in the file
+    Dtype = np.dtype([('time', '<f8'), ('count', '<i4'), ('level', '<i4'),
+                      ('threshold', '<i4'), ('len_dot', '<i4'),
+                      ('len_dash', '<i4')])
+
+    # start of a trace file
+    Magic = b'MTRACE01'
+
+    # default number of records held
+    DefaultSize = 65536
+
+    def __init__(self, size=DefaultSize):
+        """Prepare the ring.
+
+        size  the number of records held
+        """
+
+        self.size = size
+        self.ring = np.zeros(size, dtype=TokenTrace.Dtype)
+        self.total = 0          # records ever added
+
+    def record(self, time, count, level, threshold, len_dot, len_dash):
+        """Add one token record, overwriting the oldest if full."""
+
+        self.ring[self.total % self.size] = (time, count, level, threshold,
+                                             len_dot, len_dash)
+        self.total += 1
+
+    def records(self):
+        """Return a copy of the records held, oldest first."""
+
+        if self.total <= self.size:
+            return self.ring[:self.total].copy()
+        start = self.total % self.size
+        return np.concatenate((self.ring[start:], self.ring[:start]))
+
+    def dump(self, filename):
+        """Write the records held to 'filename'."""
+
+        records = self.records()
+        with open(filename, 'wb') as fd:
+            fd.write(TokenTrace.Magic)
+            fd.write(np.array([self.total, len(records)], dtype='<u8')
+                     .tobytes())
+            fd.write(records.tobytes())
+
+
+def load(filename):
+    """Read a trace file.
+
+    filename  path to the trace file
+
+    Returns (records, total), a numpy structured array of the records and
+    the number of records ever added to the trace.
+    """
+
+    with open(filename, 'rb') as fd:
+        data = fd.read()
+
+    magic = TokenTrace.Magic
+    header = len(magic) + 16
+    if data[:len(magic)] != magic or len(data) < header:
+        raise Exception("File '%s' is not a token trace" % filename)
+
+    (total, num) = np.frombuffer(data, dtype='<u8', count=2,
+                                 offset=len(magic))
+    if len(data) != header + num*TokenTrace.Dtype.itemsize:
+        raise Exception("Token trace '%s' is truncated" % filename)
+
+    records = np.frombuffer(data, dtype=TokenTrace.Dtype, offset=header)
+    return (records.copy(), int(total))
+
+
+if __name__ == '__main__':
+    import sys
+    import getopt
+
+    def usage(msg=None):
+        if msg:
+            print(('*'*80 + '\n%s\n' + '*'*80) % msg)
+        print("\n"
+              "CLI program to show a token trace file.\n\n"
+              "Usage: token_trace [-c] [-h] filename\n\n"
+              "where -c  means print every record (tab separated)\n"
+              "      -h  means print this help and stop")
+
+    # parse the CLI params
+    argv = sys.argv[1:]
+
+    try:
+        (opts, args) = getopt.getopt(argv, 'ch', ['csv', 'help'])
+    except getopt.GetoptError as err:
+        usage(err)
+        sys.exit(1)
+
+    show_all = False
+    for (opt, param) in opts:
+        if opt in ['-c', '--csv']:
+            show_all = True
+        elif opt in ['-h', '--help']:
+            usage()
+            sys.exit(0)
+
+    if len(args) != 1:
+        usage('You must give one trace file')
+        sys.exit(1)
+
+    (records, total) = load(args[0])
+
+    if show_all:
+        names = TokenTrace.Dtype.names
+        print('\t'.join(names))
+        for record in records:
+            print('%.4f\t%s' % (record['time'],
+                                '\t'.join(str(record[n]) for n in names[1:])))
+        sys.exit(0)
+
+    print('%d records (%d lost)' % (len(records), total - len(records)))
+    if len(records):
+        marks = records[records['count'] > 0]
+        print('time      %.3f to %.3f seconds'
+              % (records['time'][0], records['time'][-1]))
+        print('marks     %d, %d to %d values'
+              % (len(marks), marks['count'].min() if len(marks) else 0,
+                 marks['count'].max() if len(marks) else 0))
+        for name in ('level', 'threshold', 'len_dot', 'len_dash'):
+            values = records[name]
+            print('%-9s %d to %d, median %d'
+                  % (name, values.min(), values.max(), np.median(values)))
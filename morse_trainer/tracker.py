@@ -0,0 +1,226 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Sidetone frequency tracking front-end for the morse reader.
+
+A goertzel.Goertzel filter that tunes itself.  The recent input is kept
+and every 'interval' seconds it is cut into a few frames and transformed
+with one numpy rfft call.  The strongest keyed tone in the search band is
+the bin whose level changes most between frames, so a steady hum or
+carrier is passed over however loud it is.  The peak is then refined
+with a zoom DFT around that bin (the loudest frame evaluated on a fine
+frequency grid) and the Goertzel filter is retuned if the tone has moved
+by more than a small part of the filter bandwidth.
+
+The analysis costs a few small FFTs per 'interval', shared by all the
+blocks in between, and the filter is retuned keeping its state, so there
+is no gap in the output when the oscillator drifts.
+
+Until the first tone is found the input is held back (up to one
+analysis window) so the first characters are decoded at the right
+frequency.
+
+det = ToneTracker(rate=8000, chunk=16, length=128, low=400, high=1000,
+                  frequency=750, interval=0.25)
+---------------------------------------------------------------------
+Has the same interface as goertzel.Goertzel.  'low' and 'high' bound the
+search in hertz, 'frequency' is used until a tone is found.
+
+values = det.process(samples)
+-----------------------------
+Return an integer numpy array with one value per 'chunk' samples.  The
+values are the same however the input is split into blocks.
+
+det.set_frequency(frequency)
+----------------------------
+Tune the filter to 'frequency' and start again, the next tone found is
+jumped to as the first one is.
+
+det.retune(frequency)
+---------------------
+Tune the filter to 'frequency' keeping its state, tracking carries on
+from there.
+
+det.frequency
+-------------
+The frequency the filter is tuned to.
+
+det.locked
+----------
+True once a keyed tone has been found.
+"""
+
+import numpy as np
+
+import goertzel
+
+
+class ToneTracker:
+    """A Goertzel detector that follows the strongest keyed tone."""
+
+    # length of each analysis frame (seconds), and frames per analysis
+    FrameTime = 0.064
+    NumFrames = 8
+
+    # a keyed tone has a peak this many times the median level of the band
+    # and drops by at least this fraction of its peak between frames
+    MinRatio = 8.0
+    KeyDepth = 0.5
+
+    # the zoom DFT looks this many bins either side of the peak, in steps
+    ZoomBins = 1
+    ZoomSteps = 32
+
+    # retune when the tone moves more than this fraction of the bandwidth
+    Deadband = 0.1
+
+    def __init__(self, rate=8000, chunk=16, length=128, low=400, high=1000,
+                 frequency=750, interval=0.25):
+        """Prepare the tracker.
+
+        rate       the sample rate (samples/second)
+        chunk      number of samples per output value
+        length     Goertzel filter window length in samples
+        low        lowest frequency searched (hertz)
+        high       highest frequency searched (hertz)
+        frequency  the frequency used until a tone is found
+        interval   time between analyses (seconds)
+        """
+
+        self.rate = rate
+        self.chunk = chunk
+        self.detector = goertzel.Goertzel(frequency=frequency, rate=rate,
+                                          chunk=chunk, length=length)
+        self.deadband = ToneTracker.Deadband * rate / length
+
+        self.size = 1 << int(np.log2(rate * ToneTracker.FrameTime))
+        self.window = np.hanning(self.size)
+        freqs = np.fft.rfftfreq(self.size, 1/rate)
+        self.band = np.flatnonzero((freqs >= low) & (freqs <= high))
+        self.history_size = self.size * ToneTracker.NumFrames
+        self.interval = max(1, round(rate * interval))
+
+        # the zoom grid, in bins about the peak, and sample times
+        self.zoom = np.linspace(-ToneTracker.ZoomBins, ToneTracker.ZoomBins,
+                                2*ToneTracker.ZoomSteps + 1)
+        self.times = np.arange(self.size) / rate
+
+        self.history = np.zeros(0, dtype=np.float64)
+        self.since = 0              # samples since the last analysis
+        self.held = []              # input held back until locked
+        self.num_held = 0
+        self.holding = True
+        self.locked = False
+
+    @property
+    def frequency(self):
+        """The frequency the filter is tuned to."""
+
+        return self.detector.frequency
+
+    def set_frequency(self, frequency):
+        """Tune to 'frequency', reset the filter, look for the tone again."""
+
+        self.detector.set_frequency(frequency)
+        self.locked = False
+
+    def retune(self, frequency):
+        """Tune to 'frequency' keeping the filter state."""
+
+        self.detector.retune(frequency)
+
+    def _find_tone(self):
+        """Return the frequency of the strongest keyed tone, or None."""
+
+        frames = self.history.reshape(ToneTracker.NumFrames, self.size)
+        spectra = np.abs(np.fft.rfft(frames * self.window, axis=1))
+        spectra = spectra[:, self.band]
+
+        # the bin that changes most between frames, of those that go
+        # nearly off, if it's well clear of the noise
+        (high, low) = (spectra.max(axis=0), spectra.min(axis=0))
+        keying = np.where(low < (1 - ToneTracker.KeyDepth) * high,
+                          high - low, 0)
+        peak = int(np.argmax(keying))
+        if high[peak] < ToneTracker.MinRatio * np.median(spectra):
+            return None
+        loudest = int(np.argmax(spectra[:, peak]))
+
+        # zoom in on the peak in the loudest frame
+        bin_freq = self.rate / self.size
+        freqs = (self.band[peak] + self.zoom) * bin_freq
+        basis = np.exp(-2j * np.pi * np.outer(self.times, freqs))
+        zoomed = np.abs((frames[loudest] * self.window) @ basis)
+        return float(freqs[np.argmax(zoomed)])
+
+    def _analyse(self):
+        """Look for the tone and steer the filter to it."""
+
+        frequency = self._find_tone()
+        if frequency is None:
+            return
+
+        if not self.locked:
+            self.detector.set_frequency(frequency)
+            self.locked = True
+        elif abs(frequency - self.detector.frequency) > self.deadband:
+            self.detector.retune(frequency)
+
+    def process(self, samples):
+        """Return narrowband envelope values for a block of samples.
+
+        samples  a numpy array (or bytes of int16 data) of audio samples
+
+        A big block is split at the analysis times, and where the held
+        input is let go, so the output is the same whatever the block size.
+        """
+
+        if isinstance(samples, (bytes, bytearray)):
+            samples = np.frombuffer(samples, dtype=np.int16)
+
+        values = [np.zeros(0, dtype=np.int64)]
+        start = 0
+        while start < len(samples):
+            end = min(len(samples), start + self.interval - self.since)
+            if self.holding:
+                end = min(end, start + self.history_size - self.num_held)
+            values.append(self._process(samples[start:end]))
+            start = end
+        return np.concatenate(values)
+
+    def _process(self, samples):
+        """Process samples that don't go past the next analysis time.
+
+        The held input is let go through the filter as tuned by the
+        analysis at the end of these samples.
+        """
+
+        # keep the last analysis window of input
+        self.history = np.concatenate((self.history,
+                                       samples.astype(np.float64)))
+        self.history = self.history[-self.history_size:]
+
+        # hold the input back until the first lock, or a window's worth,
+        # a new tuning only applies to input after the analysis
+        values = np.zeros(0, dtype=np.int64)
+        if self.holding:
+            self.held.append(samples)
+            self.num_held += len(samples)
+        else:
+            values = self.detector.process(samples)
+
+        # analyse every 'interval', and as soon as a window is held
+        self.since += len(samples)
+        full = self.holding and self.num_held >= self.history_size
+        if self.since >= self.interval or full:
+            self.since = 0
+            if len(self.history) == self.history_size:
+                self._analyse()
+
+        if self.holding and (self.locked or full):
+            values = self.detector.process(np.concatenate(self.held))
+            self.held = []
+            self.holding = False
+
+        return values
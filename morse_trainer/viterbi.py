@@ -0,0 +1,289 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Bounded-beam Viterbi decoding of the element stream from ReadMorse.
+
+The greedy decoder in ReadMorse decides dot or dash, and character gap
+or not, as each element arrives, and never goes back.  This decoder
+keeps the 'width' most likely readings instead.  Every (mark, gap) pair
+is scored as each of dot/dash followed by an element, character or word
+gap, using log-normal duration models centred on ReadMorse's adapted
+timing clusters, plus a character prior.  A reading that walks off the
+code tree is dropped at once.  Readings that reach the same state (tree
+node and last character) are merged, keeping the best.  If no reading
+fits a mark, the best reading is output followed by its unfinished
+character and the mark as an unknown code, marked up like ReadMorse
+does (u'\u00bf<.-..->'), and decoding starts again.
+
+The hypotheses are held in numpy arrays and each step expands the whole
+beam at once.  Text is output as soon as every reading in the beam
+agrees on it, or after 'lag' elements, or at a word gap.
+
+beam = BeamDecoder(reader, width=32, lag=24)
+--------------------------------------------
+'reader' is the ReadMorse object whose events are decoded.
+
+chars = beam.push(event)
+------------------------
+Use one event from reader.feed(), return a list of decoded characters
+(and ' ' for word gaps) now certain.
+
+chars = beam.finish()
+---------------------
+Return the rest of the most likely reading, and start again.
+
+beam.transitions
+----------------
+A square numpy array of log probabilities added when one symbol follows
+another, indexed like beam.symbols.  All zero unless set by the caller.
+"""
+
+import numpy as np
+
+import morse_code
+
+
+class BeamDecoder:
+    """Decode ReadMorse element events with a bounded-beam Viterbi search."""
+
+    # spread of the log-normal duration models
+    MarkSigma = 0.35
+    GapSigma = 0.45
+
+    # log prior of a punctuation character against a letter or digit
+    PunctuationPenalty = -3.0
+
+    # gap classes
+    ElemGap = 0
+    CharGap = 1
+    WordGap = 2
+
+    def __init__(self, reader, width=32, lag=24):
+        """Prepare the decoder.
+
+        reader  the ReadMorse object the events come from
+        width   most readings kept
+        lag     most elements before the best reading is output
+        """
+
+        self.reader = reader
+        self.width = width
+        self.lag = lag
+
+        # symbol tables, the last symbol is the word space
+        tree = morse_code.Tree
+        self.symbols = sorted(morse_code.Codes) + [' ']
+        self.space = len(self.symbols) - 1
+        self.node_symbol = np.full(tree.size, -1, dtype=np.int64)
+        for (i, char) in enumerate(self.symbols[:-1]):
+            self.node_symbol[tree.node(char)] = i
+        self.prefixes = np.frombuffer(bytes(tree.prefixes), dtype=np.uint8)
+        self.prefixes = self.prefixes.astype(bool)
+        self.size = tree.size
+
+        self.prior = np.array([0.0 if char.isalnum()
+                               else BeamDecoder.PunctuationPenalty
+                               for char in self.symbols])
+        self.transitions = np.zeros((len(self.symbols), len(self.symbols)))
+
+        self.reset()
+
+    def reset(self):
+        """Start again with an empty beam."""
+
+        self.nodes = np.array([morse_code.CodeTree.Root], dtype=np.int64)
+        self.last = np.array([self.space], dtype=np.int64)
+        self.scores = np.zeros(1)
+
+        # per step back pointers and output, since the last commit
+        self.parents = []
+        self.emitted = []       # symbol emitted (-1 none), per hypothesis
+        self.spaced = []        # True if a word space followed
+
+        self.pending = None     # (start, duration) of the last mark
+
+    def _mark_scores(self, duration):
+        """Return the log likelihoods of a mark being a dot and a dash."""
+
+        value_time = self.reader.value_time
+        means = np.array([self.reader.len_dot, self.reader.len_dash])
+        means = np.log(np.maximum(means, 1) * value_time)
+        z = (np.log(duration) - means) / BeamDecoder.MarkSigma
+        return -0.5 * z * z
+
+    def _gap_scores(self, gap):
+        """Return the log likelihoods of a gap being each gap class.
+
+        A gap longer than the word gap centre is as likely a word gap as
+        one at the centre.
+        """
+
+        dot = max(self.reader.len_dot, 1) * self.reader.value_time
+        centres = np.log(self.reader.gaps.centres(1))
+        z = (np.log(max(gap, 1e-3) / dot) - centres) / BeamDecoder.GapSigma
+        z[BeamDecoder.WordGap] = min(z[BeamDecoder.WordGap], 0)
+        return -0.5 * z * z
+
+    def _step(self, duration, gap):
+        """Extend every reading by one mark and the gap after it."""
+
+        marks = self._mark_scores(duration)
+        gaps = self._gap_scores(gap)
+
+        # candidates indexed [hypothesis, dash, gap class]
+        num = len(self.nodes)
+        shape = (num, 2, 3)
+        nodes = (2 * self.nodes[:, None] + np.arange(2))[:, :, None]
+        nodes = np.broadcast_to(nodes, shape)
+        safe = np.minimum(nodes, self.size - 1)
+        inside = nodes < self.size
+        gap_class = np.broadcast_to(np.arange(3), shape)
+        parent = np.broadcast_to(np.arange(num)[:, None, None], shape)
+
+        symbol = np.where(inside, self.node_symbol[safe], -1)
+        ends = gap_class != BeamDecoder.ElemGap
+        valid = np.where(ends, symbol >= 0, inside & self.prefixes[safe])
+
+        scores = (self.scores[:, None, None] + marks[None, :, None]
+                  + gaps[None, None, :])
+        last = self.last[parent]
+        emit_score = (self.prior[symbol]
+                      + self.transitions[last, symbol])
+        scores = scores + np.where(ends, emit_score, 0.0)
+        space = gap_class == BeamDecoder.WordGap
+        scores = scores + np.where(space, self.transitions[symbol, self.space],
+                                   0.0)
+
+        new_nodes = np.where(ends, morse_code.CodeTree.Root, nodes)
+        new_last = np.where(space, self.space, np.where(ends, symbol, last))
+        emitted = np.where(ends, symbol, -1)
+
+        # keep the valid candidates, best first, one per state
+        (new_nodes, new_last, scores, parent, emitted, space) = (
+                a[valid] for a in (new_nodes, new_last, scores, parent,
+                                   emitted, space))
+        if not len(scores):
+            # nothing fits, treat the mark as the end of a bad character
+            return False
+        order = np.argsort(-scores, kind='stable')
+        keys = new_nodes[order] * len(self.symbols) + new_last[order]
+        (_, first) = np.unique(keys, return_index=True)
+        keep = order[np.sort(first)][:self.width]
+
+        self.nodes = new_nodes[keep]
+        self.last = new_last[keep]
+        self.scores = scores[keep] - scores[keep[0]]
+        self.parents.append(parent[keep])
+        self.emitted.append(emitted[keep])
+        self.spaced.append(space[keep])
+        return True
+
+    def _trace(self, hyp, steps):
+        """Return the text of hypothesis 'hyp' in the first 'steps' steps."""
+
+        text = []
+        for t in range(len(self.parents) - 1, -1, -1):
+            if t < steps:
+                if self.spaced[t][hyp]:
+                    text.append(' ')
+                if self.emitted[t][hyp] >= 0:
+                    text.append(self.symbols[self.emitted[t][hyp]])
+            hyp = self.parents[t][hyp]
+        text.reverse()
+        return text
+
+    def _ancestors(self, steps):
+        """Return the ancestor of each hypothesis after 'steps' steps."""
+
+        hyps = np.arange(len(self.nodes))
+        for t in range(len(self.parents) - 1, steps - 1, -1):
+            hyps = self.parents[t][hyps]
+        return hyps
+
+    def _commit(self, steps, ancestor):
+        """Return the text of the first 'steps' steps through 'ancestor'.
+
+        Readings that don't descend from 'ancestor' are dropped and the
+        history of those steps is forgotten.
+        """
+
+        keep = np.flatnonzero(self._ancestors(steps) == ancestor)
+        text = self._trace(keep[0], steps)
+
+        self.nodes = self.nodes[keep]
+        self.last = self.last[keep]
+        self.scores = self.scores[keep]
+        if len(self.parents) > steps:
+            self.parents[-1] = self.parents[-1][keep]
+            self.emitted[-1] = self.emitted[-1][keep]
+            self.spaced[-1] = self.spaced[-1][keep]
+
+        # older back pointers of unreachable readings are never followed
+        del self.parents[:steps]
+        del self.emitted[:steps]
+        del self.spaced[:steps]
+        return text
+
+    def _converged(self):
+        """Return the text all readings agree on, or the best past 'lag'."""
+
+        hyps = np.arange(len(self.nodes))
+        for t in range(len(self.parents) - 1, -1, -1):
+            hyps = np.unique(self.parents[t][hyps])
+            if len(hyps) == 1:
+                return self._commit(t, hyps[0])
+
+        if len(self.parents) > self.lag:
+            steps = len(self.parents) - self.lag
+            return self._commit(steps, self._ancestors(steps)[0])
+        return []
+
+    def _unknown(self, duration):
+        """Return the marked up code of a character no reading can take.
+
+        The code is the best reading's unfinished character and a mark of
+        'duration' as the more likely of a dot or a dash.
+        """
+
+        dash = int(np.argmax(self._mark_scores(duration)))
+        return morse_code.Tree.decode(2*int(self.nodes[0]) + dash)
+
+    def _flush(self):
+        """Return the text of the best reading, and start again."""
+
+        text = self._trace(0, len(self.parents))
+        self.reset()
+        return text
+
+    def push(self, event):
+        """Use one event from ReadMorse.feed(), return decoded characters."""
+
+        (kind, time, value) = event
+
+        if kind == self.reader.Element:
+            (_, duration) = value
+            text = []
+            if self.pending is not None:
+                (start, length) = self.pending
+                if not self._step(length, time - start - length):
+                    unknown = self._unknown(length)
+                    text = self._flush() + [unknown]
+            self.pending = (time, duration)
+            return text + self._converged()
+
+        if kind == self.reader.WordGap and self.pending is not None:
+            # the gap is at least a word gap, finish the word
+            return self.finish()
+
+        return []
+
+    def finish(self):
+        """End the last mark with a word gap, return the rest of the text."""
+
+        if self.pending is not None:
+            (_, length) = self.pending
+            if not self._step(length, float('inf')):
+                unknown = self._unknown(length)
+                return self._flush() + [unknown, ' ']
+        return self._flush()